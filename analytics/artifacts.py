@@ -0,0 +1,38 @@
+"""
+Static JSON artifacts served from web/public/data.
+
+Pipelines write each build under <dir>/<name>/ and then swap <dir>/current.json
+to a manifest naming it, so the web app never reads a half-written build.
+"""
+
+import gzip
+import json
+import os
+import shutil
+
+
+def write_json(path: str, data):
+    """Write JSON plus a precompressed .gz copy, each swapped in atomically."""
+    payload = json.dumps(data, separators=(",", ":")).encode()
+    with open(path + ".tmp", "wb") as f:
+        f.write(payload)
+    os.replace(path + ".tmp", path)
+    with gzip.open(path + ".gz.tmp", "wb", compresslevel=9) as f:
+        f.write(payload)
+    os.replace(path + ".gz.tmp", path + ".gz")
+
+
+def publish(out_dir: str, manifest: dict, current: str, keep: int = 0):
+    """Point current.json at `manifest` and prune other builds but the `keep` newest.
+
+    `current` is the build directory the manifest names.
+    """
+    write_json(os.path.join(out_dir, "current.json"), manifest)
+
+    older = sorted(
+        (d for d in os.listdir(out_dir)
+         if d != current and os.path.isdir(os.path.join(out_dir, d))),
+        reverse=True,
+    )
+    for name in older[keep:]:
+        shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
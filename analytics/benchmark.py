@@ -1,47 +1,412 @@
 """
 Performance benchmark for graph operations at various scales.
 
+Each query runs --warmup unmeasured times, then --iterations timed times on
+one session. Percentiles are linearly interpolated between order statistics,
+so p99 over a handful of samples is an estimate near the maximum rather than
+the maximum itself.
+
+Results can be written as JSON (--json) or CSV (--csv). With --baseline, a
+previous --json file is compared query by query and the run exits non-zero
+if any query's --metric regressed by more than --tolerance, so deploys can
+be gated on latency.
+
+With --load, the queries are instead replayed as a weighted mix from many
+concurrent workers (threads, one pooled session per request), either back
+to back (closed loop) or at target --rate values in requests/s (open loop,
+with latency measured from each request's scheduled start). Closed loop
+sweeps --concurrency; open loop sweeps the rates with the largest
+--concurrency as its worker pool, since a fixed rate caps throughput no
+matter how many workers share it. Each level runs for --duration seconds and
+reports throughput, error rate and latency percentiles per
+--report-interval; the sweep then names the saturation knee: the last
+worker count before throughput stops growing, or the first rate whose
+throughput falls short of it.
+
 Usage:
-    python benchmark.py [--uri bolt://localhost:7687]
+    python benchmark.py [--uri bolt://localhost:7687] [--warmup 3] [--iterations 30]
+                        [--json results.json] [--csv results.csv]
+                        [--baseline baseline.json] [--metric p95] [--tolerance 0.2]
+    python benchmark.py --load [--concurrency 1 4 16 64] [--duration 30] [--rate 50 100 200 400]
+                        [--mix search=5,communities=5] [--json load.json]
 """
 
 import argparse
+import csv
+import json
+import math
+import random
+import statistics
+import sys
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from neo4j import GraphDatabase
 
+from cypher import LIVE_COMMUNITIES
+
+# Benchmarked queries; target_ms is the mean latency goal shown in the summary
+# and weight the query's share of the --load mix
+QUERIES = [
+    {
+        "key": "stats",
+        "name": "Graph stats",
+        "cypher": "MATCH (n) RETURN count(n) as nodes",
+        "target_ms": 5,
+        "weight": 1,
+    },
+    {
+        # Same query as getCommunities in web/lib/graph-queries.ts
+        "key": "communities",
+        "name": "Community overview (level 0)",
+        "cypher": LIVE_COMMUNITIES + """
+               RETURN c
+               ORDER BY c.member_count DESC
+               LIMIT $limit""",
+        "params": {"level": 0, "limit": 200},
+        "target_ms": 5,
+        "weight": 5,
+    },
+    {
+        "key": "community_expand",
+        "name": "Community expansion",
+        "cypher": LIVE_COMMUNITIES + """
+               WITH c LIMIT 1
+               MATCH (n)-[:BELONGS_TO]->(c)
+               RETURN n LIMIT 5000""",
+        "params": {"level": 0},
+        "target_ms": 50,
+        "weight": 3,
+    },
+    {
+        "key": "search",
+        "name": "Node search (regex)",
+        "cypher": "MATCH (n) WHERE n.label =~ '(?i).*epstein.*' RETURN n LIMIT 20",
+        "target_ms": 100,
+        "weight": 5,
+    },
+    {
+        "key": "2hop",
+        "name": "2-hop neighborhood",
+        "cypher": """MATCH (center) WHERE center.id IS NOT NULL
+               WITH center LIMIT 1
+               MATCH (center)-[*1..2]-(neighbor)
+               RETURN DISTINCT neighbor LIMIT 100""",
+        "target_ms": 200,
+        "weight": 3,
+    },
+    {
+        "key": "path",
+        "name": "Shortest path",
+        "cypher": """MATCH (a), (b)
+               WHERE a.id IS NOT NULL AND b.id IS NOT NULL
+               WITH a, b LIMIT 1
+               MATCH p = shortestPath((a)-[*..6]-(b))
+               RETURN nodes(p)""",
+        "target_ms": 200,
+        "weight": 1,
+    },
+]
+
+PERCENTILES = (50, 90, 95, 99)
+
+# A concurrency level is past the knee once throughput grows less than this;
+# a rate is once throughput falls short of it by more than this
+KNEE_MIN_GAIN = 0.1
+
+CSV_FIELDS = ["key", "name", "samples", "rows", "mean", "stdev", "min", "p50", "p90", "p95", "p99", "max"]
 
-def get_driver(uri: str):
-    return GraphDatabase.driver(uri, auth=("", ""))
 
+def get_driver(uri: str, pool_size: int = 100):
+    return GraphDatabase.driver(uri, auth=("", ""), max_connection_pool_size=pool_size)
 
-def benchmark(driver, name: str, cypher: str, params: dict = None, iterations: int = 10):
-    """Run a query multiple times and report timing stats."""
+
+def percentile(sorted_values: list, q: float) -> float:
+    """q-th percentile (0-100) with linear interpolation between closest ranks."""
+    if not sorted_values:
+        return float("nan")
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(times: list) -> dict:
+    """Latency statistics in ms for a list of samples."""
+    ordered = sorted(times)
+    stats = {
+        "samples": len(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+    for q in PERCENTILES:
+        stats[f"p{q}"] = percentile(ordered, q)
+    return stats
+
+
+def benchmark(driver, name: str, cypher: str, params: dict = None, iterations: int = 10,
+              warmup: int = 3) -> dict:
+    """Run a query `warmup` times untimed, then `iterations` times timed; returns stats."""
     times = []
+    rows = 0
     with driver.session() as session:
+        for _ in range(warmup):
+            list(session.run(cypher, params or {}))
         for _ in range(iterations):
             start = time.perf_counter()
-            result = session.run(cypher, params or {})
-            records = list(result)
-            elapsed = (time.perf_counter() - start) * 1000  # ms
-            times.append(elapsed)
+            records = list(session.run(cypher, params or {}))
+            times.append((time.perf_counter() - start) * 1000)  # ms
+            rows = len(records)
 
-    avg = sum(times) / len(times)
-    p50 = sorted(times)[len(times) // 2]
-    p99 = sorted(times)[int(len(times) * 0.99)]
-    count = len(records) if records else 0
+    stats = summarize(times)
+    stats["rows"] = rows
 
     print(f"  {name}:")
-    print(f"    avg={avg:.1f}ms  p50={p50:.1f}ms  p99={p99:.1f}ms  rows={count}")
-    return avg
+    print(f"    mean={stats['mean']:.1f}ms  p50={stats['p50']:.1f}ms  p95={stats['p95']:.1f}ms  "
+          f"p99={stats['p99']:.1f}ms  max={stats['max']:.1f}ms  rows={rows}")
+    return stats
+
+
+def run_load(driver, queries: list, weights: list, concurrency: int, duration: float,
+             rate: float | None = None, interval: float = 5.0, seed: int = 0) -> dict:
+    """Replay the weighted query mix from `concurrency` threads for `duration` seconds.
+
+    Closed loop without `rate`; otherwise each worker issues its share of
+    `rate` requests/s on a fixed schedule and latency counts from the
+    scheduled time, so a backed-up server cannot hide its queueing delay.
+    """
+    samples = []  # (seconds since start, query key, latency ms, error name or None)
+    start = time.perf_counter()
+    stop = start + duration
+    period = concurrency / rate if rate else 0.0
+
+    def worker(i):
+        rng = random.Random(seed + i)
+        next_at = start + rng.random() * period
+        while True:
+            if period:
+                now = time.perf_counter()
+                if next_at > now:
+                    time.sleep(next_at - now)
+                scheduled = next_at
+                next_at += period
+            else:
+                scheduled = time.perf_counter()
+            if scheduled >= stop:
+                return
+            q = rng.choices(queries, weights)[0]
+            error = None
+            try:
+                with driver.session() as session:
+                    list(session.run(q["cypher"], q.get("params") or {}))
+            except Exception as e:
+                error = type(e).__name__
+            end = time.perf_counter()
+            samples.append((end - start, q["key"], (end - scheduled) * 1000, error))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = max(time.perf_counter() - start, duration)
+
+    ok_times = [lat for _, _, lat, error in samples if error is None]
+    errors = Counter(error for _, _, _, error in samples if error is not None)
+    report = {
+        "concurrency": concurrency,
+        "rate": rate,
+        "duration": elapsed,
+        "requests": len(samples),
+        "throughput": len(ok_times) / elapsed,
+        "error_rate": (len(samples) - len(ok_times)) / len(samples) if samples else 0.0,
+        "errors": dict(errors),
+        "latency": summarize(ok_times) if ok_times else {},
+        "queries": {},
+        "timeline": [],
+    }
+    for q in queries:
+        times = [lat for _, key, lat, error in samples if error is None and key == q["key"]]
+        if times:
+            report["queries"][q["key"]] = summarize(times)
+
+    # Requests still in flight at the deadline count toward the last window
+    windows = max(1, math.ceil(duration / interval))
+    buckets = [[] for _ in range(windows)]
+    for t, _, lat, error in samples:
+        buckets[min(int(t // interval), windows - 1)].append((lat, error))
+    for w, window in enumerate(buckets):
+        times = sorted(lat for lat, error in window if error is None)
+        width = min(interval, duration - w * interval)
+        report["timeline"].append({
+            "t": w * interval + width,
+            "throughput": len(times) / width,
+            "errors": len(window) - len(times),
+            "p50": percentile(times, 50),
+            "p99": percentile(times, 99),
+        })
+    return report
+
+
+def find_knee(levels: list) -> float | None:
+    """Where the sweep saturates; None if it never does.
+
+    Closed loop: the concurrency after which throughput grows less than
+    KNEE_MIN_GAIN. Open loop: the first rate whose throughput falls short
+    of it by more than KNEE_MIN_GAIN.
+    """
+    if levels and levels[0]["rate"]:
+        for level in levels:
+            if level["throughput"] < level["rate"] * (1 - KNEE_MIN_GAIN):
+                return level["rate"]
+        return None
+    for prev, cur in zip(levels, levels[1:]):
+        if cur["throughput"] < prev["throughput"] * (1 + KNEE_MIN_GAIN):
+            return prev["concurrency"]
+    return None
+
+
+def parse_mix(spec: str, queries: list) -> list:
+    """Weights for `queries` from "key=weight,..." (unlisted queries get 0)."""
+    mix = {}
+    for part in spec.split(","):
+        key, _, weight = part.partition("=")
+        mix[key.strip()] = float(weight or 1)
+    unknown = set(mix) - {q["key"] for q in queries}
+    if unknown:
+        raise SystemExit(f"Unknown query keys in --mix: {', '.join(sorted(unknown))}")
+    return [mix.get(q["key"], 0.0) for q in queries]
+
+
+def load_test(driver, queries: list, args) -> dict:
+    """Run the concurrency (or rate) sweep, printing each level as it finishes."""
+    weights = parse_mix(args.mix, queries) if args.mix else [q["weight"] for q in queries]
+    if args.rate:
+        workers = max(args.concurrency)
+        sweep = [(workers, rate) for rate in args.rate]
+        mode = f"open loop, {workers} workers"
+    else:
+        sweep = [(concurrency, None) for concurrency in args.concurrency]
+        mode = "closed loop"
+    print(f"Load test ({mode}), {args.duration:g}s per level, mix: "
+          + ", ".join(f"{q['key']}={w:g}" for q, w in zip(queries, weights) if w))
+
+    levels = []
+    for concurrency, rate in sweep:
+        level = run_load(driver, queries, weights, concurrency, args.duration, rate,
+                         args.report_interval)
+        levels.append(level)
+        lat = level["latency"]
+        offered = f"rate={rate:g}" if rate else f"concurrency={concurrency}"
+        print(f"\n  {offered}: {level['throughput']:.1f} req/s, "
+              f"errors={level['error_rate']:.2%}, p50={lat.get('p50', float('nan')):.1f}ms, "
+              f"p95={lat.get('p95', float('nan')):.1f}ms, p99={lat.get('p99', float('nan')):.1f}ms")
+        for w in level["timeline"]:
+            print(f"    t={w['t']:6.1f}s  {w['throughput']:8.1f} req/s  p50={w['p50']:7.1f}ms  "
+                  f"p99={w['p99']:7.1f}ms  errors={w['errors']}")
+
+    knee = find_knee(levels)
+    print("\n--- Load Summary ---")
+    print(f"  {'workers':>8} {'rate':>9} {'req/s':>9} {'errors':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for level in levels:
+        lat = level["latency"]
+        rate = f"{level['rate']:g}" if level["rate"] else "-"
+        print(f"  {level['concurrency']:>8} {rate:>9} {level['throughput']:>9.1f} {level['error_rate']:>8.2%} "
+              f"{lat.get('p50', float('nan')):>9.1f} {lat.get('p99', float('nan')):>9.1f}")
+    if knee is None:
+        print(f"  No saturation knee within the tested {'rates' if args.rate else 'concurrency levels'}.")
+    elif args.rate:
+        print(f"  Saturation knee at {knee:g} req/s (throughput over {KNEE_MIN_GAIN:.0%} short of the rate).")
+    else:
+        print(f"  Saturation knee at {knee} workers (throughput gains under {KNEE_MIN_GAIN:.0%} beyond it).")
+    return {"levels": levels, "knee": knee, "weights": dict(zip((q["key"] for q in queries), weights))}
+
+
+def compare_to_baseline(results: dict, baseline: dict, metric: str, tolerance: float,
+                        min_delta_ms: float) -> list:
+    """Queries whose `metric` grew by more than `tolerance` (and `min_delta_ms`) over the baseline."""
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if base is None or metric not in base:
+            continue
+        limit = base[metric] * (1 + tolerance)
+        if stats[metric] > limit and stats[metric] - base[metric] > min_delta_ms:
+            regressions.append({
+                "key": key,
+                "metric": metric,
+                "baseline": base[metric],
+                "current": stats[metric],
+                "change": stats[metric] / base[metric] - 1 if base[metric] else float("inf"),
+            })
+    return regressions
+
+
+def load_baseline(path: str) -> dict:
+    """Per-query results of a previous --json report; raises ValueError for other files."""
+    with open(path) as f:
+        report = json.load(f)
+    results = report.get("results") if isinstance(report, dict) else None
+    if not isinstance(results, dict):
+        kind = "a --load report" if isinstance(report, dict) and "levels" in report else "not a --json report"
+        raise ValueError(f"Baseline {path} is {kind}; it needs per-query \"results\"")
+    return results
+
+
+def write_json(path: str, report: dict):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def write_csv(path: str, results: dict):
+    names = {q["key"]: q["name"] for q in QUERIES}
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for key, stats in results.items():
+            writer.writerow({"key": key, "name": names.get(key, key),
+                             **{k: stats[k] for k in CSV_FIELDS if k in stats}})
 
 
 def main():
     parser = argparse.ArgumentParser(description="Graph benchmark")
     parser.add_argument("--uri", default="bolt://localhost:7687", help="Neo4j URI")
-    parser.add_argument("--iterations", type=int, default=10, help="Iterations per query")
+    parser.add_argument("--iterations", type=int, default=30, help="Measured iterations per query")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured warm-up runs per query")
+    parser.add_argument("--queries", nargs="*", default=None,
+                        help=f"Subset of query keys ({', '.join(q['key'] for q in QUERIES)})")
+    parser.add_argument("--json", help="Write results as JSON (usable as a later --baseline)")
+    parser.add_argument("--csv", help="Write results as CSV")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--metric", default="p95", choices=["mean", "p50", "p90", "p95", "p99", "max"],
+                        help="Statistic compared against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative increase over the baseline (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore increases smaller than this many ms (noise on fast queries)")
+    parser.add_argument("--load", action="store_true",
+                        help="Concurrent load test instead of one-at-a-time timing")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="Worker counts to sweep in --load mode (with --rate, the largest is the pool)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per concurrency level")
+    parser.add_argument("--rate", type=float, nargs="+", default=None,
+                        help="Target requests/s to sweep (open loop); default is closed loop")
+    parser.add_argument("--mix", default=None, help="Query weights as key=weight,... (default: QUERIES weights)")
+    parser.add_argument("--report-interval", type=float, default=5.0,
+                        help="Seconds per timeline window in --load mode")
     args = parser.parse_args()
 
-    driver = get_driver(args.uri)
+    baseline = None
+    if args.baseline:
+        if args.load:
+            parser.error("--baseline compares one-at-a-time runs and cannot be used with --load")
+        try:
+            baseline = load_baseline(args.baseline)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+
+    queries = [q for q in QUERIES if args.queries is None or q["key"] in args.queries]
+    # In --load mode every worker may hold a connection at once
+    driver = get_driver(args.uri, max(100, max(args.concurrency)) if args.load else 100)
 
     try:
         # Get graph size
@@ -50,75 +415,61 @@ def main():
             edge_count = session.run("MATCH ()-[r]->() RETURN count(r) as c").single()["c"]
 
         print(f"\nBenchmark: {node_count:,} nodes, {edge_count:,} edges")
-        print(f"Iterations: {args.iterations}\n")
 
-        results = {}
+        if args.load:
+            report = {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "nodes": node_count,
+                "edges": edge_count,
+                "rate": args.rate,
+                **load_test(driver, queries, args),
+            }
+            if args.json:
+                write_json(args.json, report)
+                print(f"\nResults written to {args.json}")
+            return
 
-        # Stats
-        results["stats"] = benchmark(
-            driver, "Graph stats",
-            "MATCH (n) RETURN count(n) as nodes",
-            iterations=args.iterations
-        )
-
-        # Community overview
-        results["communities"] = benchmark(
-            driver, "Community overview (level 0)",
-            "MATCH (c:Community {level: 0}) RETURN c ORDER BY c.member_count DESC LIMIT 200",
-            iterations=args.iterations
-        )
-
-        # Community expansion
-        results["community_expand"] = benchmark(
-            driver, "Community expansion",
-            """MATCH (n)-[:BELONGS_TO]->(c:Community {level: 0})
-               WITH c, collect(n) AS members LIMIT 1
-               UNWIND members AS m RETURN m LIMIT 5000""",
-            iterations=args.iterations
-        )
-
-        # Node search
-        results["search"] = benchmark(
-            driver, "Node search (regex)",
-            "MATCH (n) WHERE n.label =~ '(?i).*epstein.*' RETURN n LIMIT 20",
-            iterations=args.iterations
-        )
-
-        # k-hop neighborhood (k=2)
-        results["2hop"] = benchmark(
-            driver, "2-hop neighborhood",
-            """MATCH (center) WHERE center.id IS NOT NULL
-               WITH center LIMIT 1
-               MATCH (center)-[*1..2]-(neighbor)
-               RETURN DISTINCT neighbor LIMIT 100""",
-            iterations=args.iterations
-        )
+        print(f"Warm-up: {args.warmup}, iterations: {args.iterations}\n")
 
-        # Shortest path
-        results["path"] = benchmark(
-            driver, "Shortest path",
-            """MATCH (a), (b)
-               WHERE a.id IS NOT NULL AND b.id IS NOT NULL
-               WITH a, b LIMIT 1
-               MATCH p = shortestPath((a)-[*..6]-(b))
-               RETURN nodes(p)""",
-            iterations=args.iterations
-        )
+        results = {}
+        for q in queries:
+            results[q["key"]] = benchmark(
+                driver, q["name"], q["cypher"], q.get("params"),
+                iterations=args.iterations, warmup=args.warmup,
+            )
 
         # Summary
         print("\n--- Performance Summary ---")
-        targets = {
-            "stats": 5,
-            "communities": 5,
-            "community_expand": 50,
-            "search": 100,
-            "2hop": 200,
-            "path": 200,
+        for q in queries:
+            mean = results[q["key"]]["mean"]
+            status = "PASS" if mean <= q["target_ms"] else "FAIL"
+            print(f"  [{status}] {q['key']}: {mean:.1f}ms (target: <{q['target_ms']}ms)")
+
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "nodes": node_count,
+            "edges": edge_count,
+            "warmup": args.warmup,
+            "iterations": args.iterations,
+            "results": results,
         }
-        for key, target in targets.items():
-            avg = results.get(key, 0)
-            status = "PASS" if avg <= target else "FAIL"
-            print(f"  [{status}] {key}: {avg:.1f}ms (target: <{target}ms)")
+        if args.json:
+            write_json(args.json, report)
+            print(f"\nResults written to {args.json}")
+        if args.csv:
+            write_csv(args.csv, results)
+            print(f"Results written to {args.csv}")
+
+        if baseline is not None:
+            regressions = compare_to_baseline(results, baseline, args.metric, args.tolerance,
+                                              args.min_delta_ms)
+            print(f"\n--- Baseline ({args.baseline}, {args.metric}, +{args.tolerance:.0%} allowed) ---")
+            if regressions:
+                for r in regressions:
+                    print(f"  [REGRESSION] {r['key']}: {r['current']:.1f}ms vs {r['baseline']:.1f}ms "
+                          f"({r['change']:+.0%})")
+                sys.exit(1)
+            print("  No regressions.")
 
     finally:
         driver.close()
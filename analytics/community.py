@@ -1,186 +1,1033 @@
 """
 Community detection pipeline for Neo4j.
 
-Runs Louvain community detection, creates Community nodes with hierarchy,
-and stores results back in Neo4j.
+Runs Louvain or Leiden community detection, creates Community nodes with
+hierarchy, and stores results back in Neo4j.
+
+Each full run writes a new generation (a `generation` property on Community
+nodes and their relationships) next to the live one, then switches the
+(:CommunityGeneration {id: 'current'}) pointer over in one write. Readers
+never see a partial overview. Replaced generations stay readable, since
+clients cache community ids for a while; --collect deletes them in batches
+once they have been replaced for longer than --grace-minutes.
+
+With --artifacts-dir, the run also writes the overview for every level as
+ready-to-serve JSON (plus a .gz copy) under <dir>/<revision>/, and swaps
+<dir>/current.json to point at it, so the landing view needs no Neo4j query.
+A full run's revision is its generation; --incremental bumps the pointer's
+revision and re-exports, and the web app only serves an artifact whose
+generation and revision match the pointer.
 
 Usage:
     python community.py [--uri bolt://localhost:7687] [--levels 2] [--resolution 1.0]
+                        [--algorithm louvain|leiden] [--seed 42] [--iterations -1]
+    python community.py --incremental --changed <node_id> [<node_id> ...]
+    python community.py --collect [--keep-generations 1] [--grace-minutes 30]
 """
 
 import argparse
 import json
+import math
+import os
+import random
 import sys
 import time
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 from neo4j import GraphDatabase
 
+from artifacts import publish, write_json
+from cypher import WRITE_BATCH_SIZE, write_batches
+
+# Replaced generations younger than this stay readable for cached client ids
+# (community responses live up to s-maxage + stale-while-revalidate = 15 min)
+GENERATION_GRACE_MINUTES = 30
+
+# Components smaller than this become one community without running detection
+MIN_COMPONENT_SIZE = 3
+
+# Edge weighting for detection. Each relationship contributes its type weight
+# (or "default"), scaled by 1 + log10(1 + value) for every "log" property it
+# carries; parallel relationships between a pair are summed.
+DEFAULT_EDGE_WEIGHTS = {
+    "default": 1.0,
+    "types": {
+        "MONEY": 2.0,
+        "OWNERSHIP": 2.0,
+        "RELATIONSHIP": 1.5,
+        "COMMUNICATION": 1.0,
+        "AFFILIATION": 1.0,
+        "DOCUMENT": 0.5,
+        "MENTIONS": 0.5,
+        "REFERENCES": 0.5,
+    },
+    "properties": {"amount": "log"},
+}
+
 
 def get_driver(uri: str) -> GraphDatabase:
     return GraphDatabase.driver(uri, auth=("", ""))
 
 
-def clear_communities(driver):
-    """Remove existing community data."""
+def clear_communities(driver, levels: int = 2):
+    """Remove existing community data, including every generation."""
+    level_props = ", ".join(f"n.community_level_{level}" for level in range(max(levels, 2)))
     with driver.session() as session:
         session.run("MATCH (c:Community) DETACH DELETE c")
-        session.run("MATCH (n) REMOVE n.community_id, n.community_level_0, n.community_level_1")
+        session.run("MATCH (p:CommunityGeneration) DELETE p")
+        session.run(f"MATCH (n) REMOVE n.community_id, {level_props}")
     print("Cleared existing community data.")
 
 
-def run_louvain_igraph(driver):
-    """Fallback: export graph to igraph, run Louvain, write back."""
-    import igraph as ig
+def new_generation() -> str:
+    """Generation id for a full pipeline run (sortable UTC timestamp)."""
+    return time.strftime("%Y%m%d%H%M%S", time.gmtime())
+
+
+def community_node_id(generation: str, level: int, comm_id: int) -> str:
+    return f"community_{generation}_{level}_{comm_id}"
+
+
+def get_current_generation(driver) -> str | None:
+    with driver.session() as session:
+        record = session.run(
+            "MATCH (p:CommunityGeneration {id: 'current'}) RETURN p.generation AS generation"
+        ).single()
+    return record["generation"] if record else None
 
-    print("Falling back to python-igraph Louvain...")
 
+def activate_generation(driver, generation: str, total_weight: float | None = None):
+    """Atomically point readers at `generation`.
+
+    `total_weight` is the detection graph's total edge weight, kept on the
+    pointer so incremental updates can scale their resolution to match.
+    Each generation also gets a (:CommunityGeneration {id: <generation>})
+    record with its activated_at, and the one it replaces its replaced_at.
+    """
+    with driver.session() as session:
+        session.run("""
+            MERGE (p:CommunityGeneration {id: 'current'})
+            WITH p, p.generation AS previous
+            SET p.generation = $generation, p.revision = $generation,
+                p.activated_at = datetime(), p.total_weight = $total_weight
+            MERGE (g:CommunityGeneration {id: $generation})
+            SET g.activated_at = p.activated_at
+            FOREACH (_ IN CASE WHEN previous IS NULL OR previous = $generation THEN [] ELSE [1] END |
+                MERGE (o:CommunityGeneration {id: previous})
+                SET o.replaced_at = p.activated_at)
+        """, {"generation": generation, "total_weight": total_weight})
+    print(f"Activated community generation {generation}.")
+
+
+def collect_old_generations(driver, keep: int = 1, grace_minutes: float = GENERATION_GRACE_MINUTES):
+    """Delete replaced generations, except the `keep` most recent older ones.
+
+    Only generations replaced more than `grace_minutes` ago are deleted, so
+    ids clients still cache keep resolving. Generations without a record
+    (from before records, or abandoned builds) count as replaced long ago if
+    they are older than the current one; newer ones may still be building.
+    Relationships go first, then the Community nodes, each in batched
+    transactions so no single delete holds a huge transaction.
+    """
     with driver.session() as session:
-        # Export nodes
-        node_result = session.run("MATCH (n) RETURN n.id AS id")
-        node_ids = [r["id"] for r in node_result]
-        id_to_idx = {nid: i for i, nid in enumerate(node_ids)}
-
-        # Export edges
-        edge_result = session.run(
-            "MATCH (a)-[r]->(b) RETURN a.id AS source, b.id AS target"
+        current = session.run(
+            "MATCH (p:CommunityGeneration {id: 'current'}) RETURN p.generation AS generation"
+        ).single()
+        if current is None:
+            return
+        result = session.run("""
+            MATCH (c:Community)
+            WITH DISTINCT c.generation AS generation
+            OPTIONAL MATCH (g:CommunityGeneration {id: generation})
+            RETURN generation, g.replaced_at IS NOT NULL AS replaced,
+                   g.replaced_at < datetime() - duration({seconds: $grace}) AS expired
+        """, {"grace": int(grace_minutes * 60)})
+        rows = {r["generation"]: r for r in result
+                if r["generation"] is not None and r["generation"] != current["generation"]}
+        older = sorted(
+            (g for g, r in rows.items() if r["replaced"] or g < current["generation"]),
+            reverse=True,
         )
-        edges = []
-        for r in edge_result:
-            src = id_to_idx.get(r["source"])
-            tgt = id_to_idx.get(r["target"])
-            if src is not None and tgt is not None:
-                edges.append((src, tgt))
+        doomed = [g for g in older[keep:] if rows[g]["expired"] or not rows[g]["replaced"]]
 
-    print(f"Exported {len(node_ids)} nodes, {len(edges)} edges to igraph.")
+        # Every community relationship ends at a Community of its own generation
+        session.run(f"""
+            MATCH ()-[r]->(c:Community)
+            WHERE c.generation IS NULL OR c.generation IN $doomed
+            CALL {{ WITH r DELETE r }} IN TRANSACTIONS OF {WRITE_BATCH_SIZE} ROWS
+        """, {"doomed": doomed}).consume()
+        summary = session.run(f"""
+            MATCH (c:Community)
+            WHERE c.generation IS NULL OR c.generation IN $doomed
+            CALL {{ WITH c DETACH DELETE c }} IN TRANSACTIONS OF {WRITE_BATCH_SIZE} ROWS
+        """, {"doomed": doomed}).consume()
+        session.run(
+            "MATCH (g:CommunityGeneration) WHERE g.id IN $doomed DELETE g", {"doomed": doomed}
+        )
+
+    kept = [current["generation"]] + sorted(set(rows) - set(doomed), reverse=True)
+    print(f"Garbage-collected {summary.counters.nodes_deleted} community nodes "
+          f"from old generations (kept {', '.join(kept)}).")
+
+
+def load_edge_weights(path: str | None) -> dict:
+    """Load an edge weight config (same shape as DEFAULT_EDGE_WEIGHTS).
+
+    "log" is the only property scaling mode; anything else is rejected rather
+    than silently treated as log.
+    """
+    if not path:
+        return DEFAULT_EDGE_WEIGHTS
+    with open(path) as f:
+        config = json.load(f)
+    properties = config.get("properties", {})
+    for prop, mode in properties.items():
+        if mode != "log":
+            raise ValueError(f"Unsupported scaling {mode!r} for edge property {prop!r} (only 'log')")
+    return {
+        "default": config.get("default", 1.0),
+        "types": config.get("types", {}),
+        "properties": properties,
+    }
 
-    # Build igraph graph
-    g = ig.Graph(n=len(node_ids), edges=edges, directed=True)
-    g.vs["node_id"] = node_ids
 
-    # Run Louvain (on undirected version)
-    g_undirected = g.as_undirected()
-    partition = g_undirected.community_multilevel()
+def edge_weight(rel_type: str, values: list, edge_weights: dict) -> float:
+    """Weight of one relationship; `values` follow edge_weights["properties"], all "log"."""
+    weight = edge_weights["types"].get(rel_type, edge_weights["default"])
+    for value in values:
+        if isinstance(value, (int, float)) and value > 0:
+            weight *= 1 + math.log10(1 + value)
+    return weight
+
+
+def collapse_edges(records, id_to_idx: dict, edge_weights: dict):
+    """Sum weighted relationships into one undirected edge per node pair.
+
+    `records` carry source/target element ids, the relationship type and the
+    configured property values. Self-loops and edges leaving the index are
+    dropped. Returns (edges, weights, counts), counts being the number of
+    relationships behind each edge.
+    """
+    pairs = {}
+    counts = {}
+    for r in records:
+        src = id_to_idx.get(r["source"])
+        tgt = id_to_idx.get(r["target"])
+        if src is None or tgt is None or src == tgt:
+            continue
+        key = (src, tgt) if src < tgt else (tgt, src)
+        pairs[key] = pairs.get(key, 0.0) + edge_weight(r["type"], r["values"], edge_weights)
+        counts[key] = counts.get(key, 0) + 1
+    return list(pairs), list(pairs.values()), list(counts.values())
+
+
+def find_nodes_by_id(session, ids: list) -> list:
+    """Element ids of graph nodes whose `id` is in `ids`.
+
+    Matched one label at a time so each lookup can use that label's id index
+    instead of scanning every node.
+    """
+    labels = [
+        r["label"] for r in session.run("CALL db.labels() YIELD label RETURN label")
+        if r["label"] not in ("Community", "CommunityGeneration")
+    ]
+    found = {}
+    for label in labels:
+        result = session.run(
+            f"MATCH (n:`{label}`) WHERE n.id IN $ids RETURN elementId(n) AS eid", {"ids": ids}
+        )
+        for r in result:
+            found[r["eid"]] = None
+    return list(found)
+
+
+def estimate_total_weight(session, edge_weights: dict) -> float:
+    """Total edge weight from the count store, ignoring property scaling.
+
+    Fallback for generations activated before the pointer recorded the
+    detection graph's weight.
+    """
+    total = 0.0
+    types = [r["type"] for r in session.run(
+        "CALL db.relationshipTypes() YIELD relationshipType AS type RETURN type"
+    )]
+    for rel_type in types:
+        if rel_type in ("BELONGS_TO", "INTER_COMMUNITY", "PARENT_OF"):
+            continue
+        count = session.run(f"MATCH ()-[r:`{rel_type}`]->() RETURN count(r) AS count").single()["count"]
+        total += count * edge_weights["types"].get(rel_type, edge_weights["default"])
+    return total
+
+
+def export_graph(driver, edge_weights: dict = DEFAULT_EDGE_WEIGHTS):
+    """Export all nodes and edges as a weighted undirected igraph graph."""
+    import igraph as ig
 
-    # Write back
-    membership = partition.membership
     with driver.session() as session:
-        for idx, comm_id in enumerate(membership):
-            session.run(
-                "MATCH (n {id: $id}) SET n.community_level_0 = $comm",
-                {"id": node_ids[idx], "comm": comm_id},
-            )
+        # Export nodes (element ids give an indexed lookup for write-back)
+        node_result = session.run(
+            "MATCH (n) WHERE NOT n:Community AND NOT n:CommunityGeneration "
+            "RETURN elementId(n) AS eid, n.id AS id"
+        )
+        element_ids = []
+        node_ids = []
+        for r in node_result:
+            element_ids.append(r["eid"])
+            node_ids.append(r["id"])
+        id_to_idx = {eid: i for i, eid in enumerate(element_ids)}
+
+        # Export edges, collapsed to weighted node pairs
+        edge_result = session.run("""
+            MATCH (a)-[r]->(b)
+            RETURN elementId(a) AS source, elementId(b) AS target, type(r) AS type,
+                   [k IN $props | r[k]] AS values
+        """, {"props": list(edge_weights["properties"])})
+        edges, weights, counts = collapse_edges(edge_result, id_to_idx, edge_weights)
+
+    print(f"Exported {len(node_ids)} nodes, {len(edges)} weighted edges to igraph.")
+
+    g = ig.Graph(n=len(node_ids), edges=edges, directed=False)
+    g.vs["eid"] = element_ids
+    g.vs["node_id"] = node_ids
+    g.es["weight"] = weights
+    g.es["count"] = counts
+    return g
+
+
+def detect_communities(g, algorithm: str = "louvain", resolution: float = 1.0,
+                       seed: int | None = None, iterations: int = -1, weights=None):
+    """Partition an undirected igraph graph, returning the membership list.
+
+    `iterations` caps Leiden refinement passes (-1 runs until stable); Louvain
+    always runs to convergence.
+    """
+    if algorithm == "leiden":
+        import leidenalg
+
+        partition = leidenalg.find_partition(
+            g,
+            leidenalg.RBConfigurationVertexPartition,
+            weights=weights,
+            resolution_parameter=resolution,
+            n_iterations=iterations,
+            seed=seed,
+        )
+        return list(partition.membership)
+
+    if algorithm == "louvain":
+        # igraph draws from Python's random module
+        if seed is not None:
+            random.seed(seed)
+        return g.community_multilevel(weights=weights, resolution=resolution).membership
+
+    raise ValueError(f"Unknown algorithm: {algorithm}")
+
+
+def optimise_region(n: int, edges: list, weights: list, membership: list, fixed: list,
+                    resolution: float = 1.0, seed: int | None = None,
+                    iterations: int = -1) -> list:
+    """Improve `membership` of a region graph while `fixed` nodes keep theirs.
+
+    Fixed nodes keep their community labels, so other nodes can join their
+    communities but never relabel them. Runs leidenalg's optimiser for either
+    backend, since igraph's multilevel cannot pin nodes; both optimize the
+    same modularity.
+    """
+    import igraph as ig
+    import leidenalg
+
+    g = ig.Graph(n=n, edges=edges, directed=False)
+    partition = leidenalg.RBConfigurationVertexPartition(
+        g, initial_membership=membership, weights=weights, resolution_parameter=resolution
+    )
+    optimiser = leidenalg.Optimiser()
+    if seed is not None:
+        optimiser.set_rng_seed(seed)
+    optimiser.optimise_partition(partition, n_iterations=iterations, is_membership_fixed=fixed)
+    return list(partition.membership)
+
+
+def _detect_component(task):
+    """Process pool worker: partition one component given as an edge list."""
+    import igraph as ig
+
+    n, edges, weights, algorithm, resolution, seed, iterations = task
+    sub = ig.Graph(n=n, edges=edges, directed=False)
+    sub.es["weight"] = weights
+    return detect_communities(sub, algorithm, resolution, seed, iterations, weights="weight")
+
+
+def detect_communities_by_component(g, algorithm: str = "louvain", resolution: float = 1.0,
+                                    seed: int | None = None, iterations: int = -1,
+                                    workers: int | None = None):
+    """Partition each connected component separately, in a process pool.
+
+    No community spans two components, so the partition matches detection on
+    the whole graph as long as each component's resolution is scaled by its
+    share of the total edge weight. Tiny components become one community each.
+    Returns a membership list with globally unique community ids.
+    """
+    total_weight = sum(g.es["weight"]) if g.ecount() else 0.0
+    components = sorted(g.connected_components(), key=len, reverse=True)
+
+    membership = [0] * g.vcount()
+    tasks = []
+    task_components = []
+    trivial = []
+    for comp in components:
+        if len(comp) < MIN_COMPONENT_SIZE:
+            trivial.append(comp)
+            continue
+        sub = g.subgraph(comp)
+        sub_weight = sum(sub.es["weight"])
+        tasks.append((
+            sub.vcount(),
+            sub.get_edgelist(),
+            sub.es["weight"],
+            algorithm,
+            resolution * sub_weight / total_weight,
+            seed,
+            iterations,
+        ))
+        task_components.append(comp)
+
+    print(f"Detecting communities in {len(tasks)} components "
+          f"({len(trivial)} trivial) with {workers or os.cpu_count()} workers...")
+
+    if workers == 1 or len(tasks) <= 1:
+        results = [_detect_component(task) for task in tasks]
+    else:
+        # Largest components go first; small ones are shipped in chunks
+        chunksize = max(1, len(tasks) // ((workers or os.cpu_count()) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_detect_component, tasks, chunksize=chunksize))
+
+    next_id = 0
+    for comp, local in zip(task_components, results):
+        for v, c in zip(comp, local):
+            membership[v] = next_id + c
+        next_id += max(local) + 1
+
+    for comp in trivial:
+        for v in comp:
+            membership[v] = next_id
+        next_id += 1
+
+    return membership
+
+
+def coarsen_graph(g, membership):
+    """Collapse each community into one vertex, summing edge weights.
+
+    Intra-community edges become weighted self-loops so modularity on the
+    coarse graph matches the partition it was built from.
+    """
+    coarse = g.copy()
+    coarse.contract_vertices(membership, combine_attrs=None)
+    coarse.simplify(multiple=True, loops=False, combine_edges={"weight": "sum"})
+    return coarse
+
+
+def inter_community_edges(g, membership) -> list:
+    """Aggregate relationship counts between communities from the partition.
+
+    Works on the exported edge list in vectorized form and returns one
+    (source, target, edge_count) tuple per unordered community pair, with
+    source < target.
+    """
+    import numpy as np
+
+    if g.ecount() == 0:
+        return []
+    edges = np.asarray(g.get_edgelist(), dtype=np.int64)
+    comm = np.asarray(membership, dtype=np.int64)
+    a = comm[edges[:, 0]]
+    b = comm[edges[:, 1]]
+    crossing = a != b
+    lo = np.minimum(a, b)[crossing]
+    hi = np.maximum(a, b)[crossing]
+    counts = np.asarray(g.es["count"], dtype=np.int64)[crossing]
+
+    base = int(comm.max()) + 1
+    keys, inverse = np.unique(lo * base + hi, return_inverse=True)
+    totals = np.bincount(inverse, weights=counts).astype(np.int64)
+    return [
+        (int(k // base), int(k % base), int(c))
+        for k, c in zip(keys, totals)
+    ]
+
+
+def write_inter_community_edges(driver, level: int, generation: str, pairs: list):
+    """Write (source, target, edge_count) pairs as INTER_COMMUNITY relationships."""
+    write_batches(driver, """
+        UNWIND $rows AS row
+        MATCH (c1:Community {id: row.source})
+        MATCH (c2:Community {id: row.target})
+        CREATE (c1)-[:INTER_COMMUNITY {
+            edge_count: row.edge_count, edge_type: '_inter_community', generation: row.generation
+        }]->(c2)
+    """, [
+        {
+            "source": community_node_id(generation, level, src),
+            "target": community_node_id(generation, level, tgt),
+            "edge_count": count,
+            "generation": generation,
+        }
+        for src, tgt, count in pairs
+    ])
+    print(f"Created {len(pairs)} inter-community edges at level {level}.")
+
+
+def refresh_inter_community_edges(session, level: int, generation: str, comms: list):
+    """Recompute INTER_COMMUNITY edges touching `comms` at `level` from member edges.
+
+    One edge per community pair, from the lower to the higher id, as in
+    inter_community_edges.
+    """
+    session.run("""
+        MATCH (c:Community {level: $level, generation: $generation})-[e:INTER_COMMUNITY]-()
+        WHERE c.community_id IN $comms
+        DELETE e
+    """, {"level": level, "generation": generation, "comms": comms})
+    session.run("""
+        MATCH (c1:Community {level: $level, generation: $generation})
+        WHERE c1.community_id IN $comms
+        MATCH (c1)<-[:BELONGS_TO]-(a)-[r]-(b)
+              -[:BELONGS_TO]->(c2:Community {level: $level, generation: $generation})
+        WHERE c2 <> c1 AND (NOT c2.community_id IN $comms OR c1.community_id < c2.community_id)
+        WITH c1, c2, count(r) AS edge_count
+        WITH CASE WHEN c1.community_id < c2.community_id THEN [c1, c2] ELSE [c2, c1] END AS pair,
+             edge_count
+        WITH pair[0] AS src, pair[1] AS tgt, edge_count
+        CREATE (src)-[:INTER_COMMUNITY {edge_count: edge_count, edge_type: '_inter_community',
+                                       generation: $generation}]->(tgt)
+    """, {"level": level, "generation": generation, "comms": comms})
+
+
+def run_community_detection(driver, algorithm: str = "louvain", resolution: float = 1.0,
+                            seed: int | None = None, iterations: int = -1, levels: int = 1,
+                            level_factor: float = 0.5,
+                            edge_weights: dict = DEFAULT_EDGE_WEIGHTS,
+                            workers: int | None = None):
+    """Export graph to igraph, detect communities, write the hierarchy back.
+
+    Level 0 partitions the graph itself; each level N+1 partitions the
+    coarsened level-N community graph at `resolution * level_factor ** (N+1)`,
+    since the level-0 optimum has no merges left at the same resolution.
+    Every node gets a `community_level_{N}` property per computed level, and
+    the returned `parents` maps each level-N community id to its level N+1
+    parent, and `inter_community` holds each level's aggregated edges.
+    """
+    g = export_graph(driver, edge_weights)
+
+    start = time.time()
+    membership = detect_communities_by_component(
+        g, algorithm, resolution, seed, iterations, workers
+    )
+    elapsed = time.time() - start
 
     num_communities = len(set(membership))
-    print(f"igraph Louvain: {num_communities} communities, {len(node_ids)} nodes assigned.")
-    return True
+    modularity = (
+        g.modularity(membership, weights="weight", resolution=resolution) if g.ecount() else 0.0
+    )
+    print(f"{algorithm}: {num_communities} communities, modularity={modularity:.4f}, "
+          f"resolution={resolution}, {elapsed:.2f}s.")
 
+    # Recursive coarsening for higher levels
+    memberships = [membership]
+    parents = []
+    current = g
+    while len(memberships) < levels:
+        current = coarsen_graph(current, memberships[-1] if current is g else parents[-1])
+        if current.vcount() <= 1:
+            break
+        level_resolution = resolution * level_factor ** len(memberships)
+        level_membership = detect_communities(
+            current, algorithm, level_resolution, seed, iterations, weights="weight"
+        )
+        if len(set(level_membership)) == current.vcount():
+            print(f"Level {len(memberships)}: no further merges, stopping hierarchy.")
+            break
+        parents.append(level_membership)
+        memberships.append([level_membership[c] for c in memberships[-1]])
+        print(f"Level {len(memberships) - 1}: {len(set(level_membership))} communities.")
+
+    # Write back in batches, matching on element id
+    rows = []
+    for idx, eid in enumerate(g.vs["eid"]):
+        rows.append({
+            "eid": eid,
+            "levels": {f"community_level_{lvl}": m[idx] for lvl, m in enumerate(memberships)},
+        })
+    write_batches(driver, """
+        UNWIND $rows AS row
+        MATCH (n) WHERE elementId(n) = row.eid
+        SET n += row.levels
+    """, rows)
+
+    print(f"Assigned {g.vcount()} nodes to {len(memberships)} community levels.")
+    return {
+        "algorithm": algorithm,
+        "total_weight": sum(g.es["weight"]) if g.ecount() else 0.0,
+        "resolution": resolution,
+        "communities": num_communities,
+        "modularity": modularity,
+        "runtime": elapsed,
+        "levels": len(memberships),
+        "parents": parents,
+        "inter_community": [inter_community_edges(g, m) for m in memberships],
+    }
+
+
+def link_community_hierarchy(driver, parents: list, generation: str):
+    """Create (parent)-[:PARENT_OF]->(child) links between adjacent levels."""
+    rows = []
+    for child_level, level_parents in enumerate(parents):
+        for child_id, parent_id in enumerate(level_parents):
+            rows.append({
+                "parent": community_node_id(generation, child_level + 1, parent_id),
+                "child": community_node_id(generation, child_level, child_id),
+                "generation": generation,
+            })
+
+    write_batches(driver, """
+        UNWIND $rows AS row
+        MATCH (p:Community {id: row.parent})
+        MATCH (c:Community {id: row.child})
+        CREATE (p)-[:PARENT_OF {generation: row.generation}]->(c)
+    """, rows)
+    print(f"Linked {len(rows)} communities to their parents.")
+
+
+def summarize_communities(driver, community_ids: list, batch_size: int = 500):
+    """Write type distribution and top 5 nodes by doc_count onto communities.
+
+    Both are aggregated per community inside Neo4j from its BELONGS_TO
+    members, so only the summaries leave the database.
+    """
+    rows = []
+    with driver.session() as session:
+        for start in range(0, len(community_ids), batch_size):
+            result = session.run("""
+                UNWIND $ids AS cid
+                MATCH (c:Community {id: cid})
+                CALL {
+                    WITH c
+                    MATCH (n)-[:BELONGS_TO]->(c)
+                    WITH coalesce(n.node_type, 'Unknown') AS node_type, count(*) AS type_count
+                    RETURN collect([node_type, type_count]) AS types
+                }
+                CALL {
+                    WITH c
+                    MATCH (n)-[:BELONGS_TO]->(c)
+                    WITH n ORDER BY coalesce(n.doc_count, 0) DESC LIMIT 5
+                    RETURN collect({
+                        id: coalesce(n.id, ''),
+                        label: coalesce(n.label, n.name, ''),
+                        doc_count: coalesce(n.doc_count, 0)
+                    }) AS top_nodes
+                }
+                RETURN c.id AS id, types, top_nodes
+            """, {"ids": community_ids[start:start + batch_size]})
+            for r in result:
+                type_dist = dict(r["types"])
+                rows.append({
+                    "id": r["id"],
+                    "member_count": sum(type_dist.values()),
+                    "type_distribution": json.dumps(type_dist),
+                    "top_nodes": json.dumps(r["top_nodes"]),
+                })
 
-def create_community_nodes(driver, level: int = 0):
-    """Create (:Community) nodes from community assignments."""
+    write_batches(driver, """
+        UNWIND $rows AS row
+        MATCH (c:Community {id: row.id})
+        SET c.member_count = row.member_count,
+            c.type_distribution = row.type_distribution,
+            c.top_nodes = row.top_nodes
+    """, rows)
+    return rows
+
+
+def create_community_nodes(driver, level: int = 0, generation: str = ""):
+    """Create (:Community) nodes of `generation` from community assignments."""
     with driver.session() as session:
-        # Get community stats
+        # Community sizes, aggregated in the database
         result = session.run(f"""
             MATCH (n) WHERE n.community_level_{level} IS NOT NULL
-            WITH n.community_level_{level} AS comm_id, collect(n) AS members
-            RETURN comm_id, size(members) AS member_count, members
+            RETURN n.community_level_{level} AS comm_id, count(*) AS member_count
         """)
+        communities = [
+            {
+                "id": community_node_id(generation, level, r["comm_id"]),
+                "level": level,
+                "generation": generation,
+                "community_id": r["comm_id"],
+                "member_count": r["member_count"],
+            }
+            for r in result
+        ]
 
-        communities = []
-        for record in result:
-            comm_id = record["comm_id"]
-            member_count = record["member_count"]
-            members = record["members"]
-
-            # Compute type distribution
-            type_dist = Counter()
-            top_nodes = []
-            for m in members:
-                props = dict(m)
-                type_dist[props.get("node_type", "Unknown")] += 1
-                top_nodes.append({
-                    "id": props.get("id", ""),
-                    "label": props.get("label", props.get("name", "")),
-                    "doc_count": props.get("doc_count", 0),
-                })
+    # Create community nodes
+    write_batches(driver, """
+        UNWIND $rows AS row
+        CREATE (c:Community {
+            id: row.id,
+            level: row.level,
+            generation: row.generation,
+            community_id: row.community_id,
+            member_count: row.member_count,
+            type_distribution: '{}',
+            top_nodes: '[]',
+            node_type: '_community'
+        })
+    """, communities)
+
+    params = {"prefix": community_node_id(generation, level, ""), "generation": generation}
+    with driver.session() as session:
+        # Link members to community in one batched pass
+        session.run(f"""
+            MATCH (n) WHERE n.community_level_{level} IS NOT NULL AND NOT n:Community
+            CALL {{
+                WITH n
+                MATCH (c:Community {{id: $prefix + toString(n.community_level_{level})}})
+                CREATE (n)-[:BELONGS_TO {{generation: $generation}}]->(c)
+            }} IN TRANSACTIONS OF {WRITE_BATCH_SIZE} ROWS
+        """, params).consume()
 
-            # Sort by doc_count for top nodes
-            top_nodes.sort(key=lambda x: x.get("doc_count", 0), reverse=True)
-            top_nodes = top_nodes[:5]
+    summarize_communities(driver, [c["id"] for c in communities])
 
-            communities.append({
-                "id": f"community_{level}_{comm_id}",
-                "level": level,
-                "community_id": comm_id,
-                "member_count": member_count,
-                "type_distribution": dict(type_dist),
-                "top_nodes": top_nodes,
-            })
+    print(f"Created {len(communities)} community nodes at level {level}.")
+    return communities
 
-        # Create community nodes
-        for comm in communities:
+
+def update_communities_incremental(driver, changed_ids: list, resolution: float = 1.0,
+                                  seed: int | None = None, iterations: int = -1,
+                                  edge_weights: dict = DEFAULT_EDGE_WEIGHTS) -> str | None:
+    """Re-optimize level-0 communities around a set of changed nodes.
+
+    `changed_ids` are the ids of added or edited nodes and of the endpoints of
+    added, edited or deleted edges (pass the former neighbours of a deleted
+    node). Only the communities of those nodes and their neighbours are
+    re-partitioned; everything else keeps its assignment. Neighbours outside
+    the region stay in the graph with fixed membership, so members' external
+    edges still count and region nodes may join a neighbouring community, and
+    the resolution is scaled by the region's share of the total edge weight
+    as in detect_communities_by_component. Higher levels are not re-optimized:
+    a community that keeps its id keeps its parent, a new one joins the
+    parent of the community it split from (or is most connected to), and
+    members' higher-level BELONGS_TO, community_level_N properties and
+    counts follow. The live generation is updated in place and the pointer
+    gets a new revision, which is returned.
+    """
+    level = 0
+    with driver.session() as session:
+        pointer = session.run(
+            "MATCH (p:CommunityGeneration {id: 'current'}) "
+            "RETURN p.generation AS generation, p.total_weight AS total_weight"
+        ).single()
+    if pointer is None or pointer["generation"] is None:
+        print("No active community generation. Run the full pipeline first.")
+        return None
+    generation = pointer["generation"]
+
+    with driver.session() as session:
+        changed_eids = find_nodes_by_id(session, changed_ids)
+
+        # Communities touched by the change and its 1-hop neighbourhood, read
+        # from BELONGS_TO of the live generation: community_level_N properties
+        # may already hold a newer run's ids that is not active yet
+        result = session.run("""
+            UNWIND $eids AS eid
+            MATCH (n) WHERE elementId(n) = eid
+            OPTIONAL MATCH (n)-[:BELONGS_TO]->(c:Community {level: $level, generation: $generation})
+            OPTIONAL MATCH (n)--(m)-[:BELONGS_TO]->(d:Community {level: $level, generation: $generation})
+            RETURN collect(c.community_id) + collect(d.community_id) AS comms
+        """, {"eids": changed_eids, "level": level, "generation": generation})
+        affected = sorted(set(result.single()["comms"]))
+
+        # Region: members of affected communities plus the changed nodes
+        result = session.run("""
+            MATCH (c:Community {level: $level, generation: $generation}) WHERE c.community_id IN $comms
+            MATCH (n)-[:BELONGS_TO]->(c)
+            RETURN elementId(n) AS eid, c.community_id AS comm
+            UNION
+            UNWIND $eids AS changed
+            MATCH (n) WHERE elementId(n) = changed
+            OPTIONAL MATCH (n)-[:BELONGS_TO]->(c:Community {level: $level, generation: $generation})
+            RETURN elementId(n) AS eid, c.community_id AS comm
+        """, {"level": level, "generation": generation, "comms": affected, "eids": changed_eids})
+        old_comm = {}
+        for r in result:
+            if old_comm.get(r["eid"]) is None:
+                old_comm[r["eid"]] = r["comm"]
+        element_ids = list(old_comm)
+
+        # Relationships of region nodes, each once, with their outside endpoints
+        result = session.run("""
+            UNWIND $eids AS eid
+            MATCH (a) WHERE elementId(a) = eid
+            MATCH (a)-[r]-(b) WHERE NOT b:Community
+            RETURN DISTINCT elementId(r) AS rid, elementId(startNode(r)) AS source,
+                   elementId(endNode(r)) AS target, type(r) AS type,
+                   [k IN $props | r[k]] AS values
+        """, {"eids": element_ids, "props": list(edge_weights["properties"])})
+        records = list(result)
+
+        # Boundary: outside neighbours, pinned to their current community
+        boundary_eids = sorted({
+            eid for r in records for eid in (r["source"], r["target"]) if eid not in old_comm
+        })
+        result = session.run("""
+            UNWIND $eids AS eid
+            MATCH (n)-[:BELONGS_TO]->(c:Community {level: $level, generation: $generation})
+            WHERE elementId(n) = eid
+            RETURN eid, c.community_id AS comm
+        """, {"eids": boundary_eids, "level": level, "generation": generation})
+        boundary = {r["eid"]: r["comm"] for r in result}
+
+        total_weight = pointer["total_weight"]
+        if not total_weight:
+            total_weight = estimate_total_weight(session, edge_weights)
+
+        result = session.run("""
+            MATCH (c:Community {level: $level, generation: $generation})
+            RETURN max(c.community_id) AS max_id
+        """, {"level": level, "generation": generation})
+        next_id = (result.single()["max_id"] or 0) + 1
+
+    if not element_ids:
+        print("No changed nodes found. Nothing to update.")
+        return None
+
+    nodes = element_ids + list(boundary)
+    id_to_idx = {eid: i for i, eid in enumerate(nodes)}
+    edges, weights, _ = collapse_edges(records, id_to_idx, edge_weights)
+    region_weight = sum(weights)
+    region_resolution = resolution * region_weight / total_weight if total_weight else resolution
+
+    print(f"Re-optimizing {len(affected)} communities: {len(element_ids)} nodes "
+          f"({len(boundary)} fixed neighbours), {len(edges)} edges, "
+          f"resolution {region_resolution:.4g}.")
+
+    # Start from the current partition; new nodes start alone
+    labels = {}
+    initial = []
+    for eid in nodes:
+        comm = boundary[eid] if eid in boundary else old_comm[eid]
+        key = ("old", comm) if comm is not None else ("new", eid)
+        initial.append(labels.setdefault(key, len(labels)))
+    fixed = [eid in boundary for eid in nodes]
+    local = optimise_region(
+        len(nodes), edges, weights, initial, fixed, region_resolution, seed, iterations
+    )
+
+    # Fixed neighbours keep their labels, so those map back to their community;
+    # other local communities keep the old id they mostly overlap, else a new one
+    assignment = {local[id_to_idx[eid]]: comm for eid, comm in boundary.items()}
+    taken = set(assignment.values())
+    overlap = Counter(
+        (local[idx], old_comm[eid]) for idx, eid in enumerate(element_ids)
+        if old_comm[eid] is not None
+    )
+    for (local_id, comm), _ in overlap.most_common():
+        if local_id not in assignment and comm not in taken:
+            assignment[local_id] = comm
+            taken.add(comm)
+    for local_id in sorted(set(local)):
+        if local_id not in assignment:
+            assignment[local_id] = next_id
+            next_id += 1
+
+    new_comm = [assignment[local[idx]] for idx in range(len(element_ids))]
+    touched = sorted(set(affected) | set(new_comm))
+    emptied = [c for c in affected if c not in set(new_comm)]
+    live = [c for c in touched if c not in emptied]
+    existing = set(affected) | set(boundary.values())
+    created = [c for c in touched if c not in existing]
+    created_set = set(created)
+
+    # Ancestors ({level: community_id}) of the communities around the region
+    with driver.session() as session:
+        result = session.run("""
+            UNWIND $ids AS cid
+            MATCH (c:Community {id: cid})
+            OPTIONAL MATCH (a:Community)-[:PARENT_OF*1..]->(c)
+            RETURN c.community_id AS comm, [a IN collect(a) | [a.level, a.community_id]] AS ancestors
+        """, {"ids": [community_node_id(generation, level, c) for c in existing]})
+        chains = {r["comm"]: dict(r["ancestors"]) for r in result}
+
+    # New communities join the parent of the old community they overlap most,
+    # else of the community they share the most edge weight with
+    origin = {}
+    for (local_id, comm), _ in overlap.most_common():
+        origin.setdefault(assignment[local_id], comm)
+    comm_of = dict(zip(element_ids, new_comm)) | boundary
+    links = Counter()
+    for (i, j), w in zip(edges, weights):
+        a, b = comm_of.get(nodes[i]), comm_of.get(nodes[j])
+        if a != b:
+            links[(a, b)] += w
+            links[(b, a)] += w
+    for (a, b), _ in links.most_common():
+        if a in created_set and b in chains:
+            origin.setdefault(a, b)
+    for c in created:
+        chains[c] = chains.get(origin.get(c), {})
+    top = max((lvl for chain in chains.values() for lvl in chain), default=level)
+
+    # Create communities that did not exist before the change, placed at the
+    # centroid of their neighbours (or on the community they split from)
+    write_batches(driver, """
+        UNWIND $rows AS row
+        MERGE (c:Community {id: row.id})
+        ON CREATE SET c.level = row.level, c.generation = row.generation,
+                      c.community_id = row.community_id,
+                      c.member_count = 0, c.node_type = '_community'
+        WITH c, row
+        OPTIONAL MATCH (p:Community {id: row.parent})
+        FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END |
+            CREATE (p)-[:PARENT_OF {generation: row.generation}]->(c))
+    """, [
+        {
+            "id": community_node_id(generation, level, c),
+            "level": level,
+            "generation": generation,
+            "community_id": c,
+            "parent": (community_node_id(generation, level + 1, chains[c][level + 1])
+                       if level + 1 in chains[c] else None),
+        }
+        for c in created
+    ])
+
+    # Move members: property, then BELONGS_TO
+    write_batches(driver, f"""
+        UNWIND $rows AS row
+        MATCH (n) WHERE elementId(n) = row.eid
+        SET n.community_level_{level} = row.comm
+        WITH n, row
+        OPTIONAL MATCH (n)-[old:BELONGS_TO]
+                       ->(:Community {{level: {level}, generation: row.generation}})
+        DELETE old
+        WITH DISTINCT n, row
+        MATCH (c:Community {{id: row.community}})
+        CREATE (n)-[:BELONGS_TO {{generation: row.generation}}]->(c)
+    """, [
+        {
+            "eid": eid,
+            "comm": comm,
+            "community": community_node_id(generation, level, comm),
+            "generation": generation,
+        }
+        for eid, comm in zip(element_ids, new_comm)
+    ])
+
+    # Higher levels follow the new level-0 community's ancestors
+    moved = {lvl: set() for lvl in range(level + 1, top + 1)}
+    rechained = []
+    for eid, comm in zip(element_ids, new_comm):
+        before = chains.get(old_comm[eid], {}) if old_comm[eid] is not None else {}
+        if before == chains[comm]:
+            continue
+        rechained.append((eid, comm))
+        for lvl in moved:
+            if before.get(lvl) != chains[comm].get(lvl):
+                moved[lvl].update(c for c in (before.get(lvl), chains[comm].get(lvl)) if c is not None)
+    if top > level:
+        write_batches(driver, f"""
+            UNWIND $rows AS row
+            MATCH (n) WHERE elementId(n) = row.eid
+            SET n += row.levels
+            WITH n, row
+            OPTIONAL MATCH (n)-[old:BELONGS_TO]->(o:Community {{generation: row.generation}})
+            WHERE o.level > {level}
+            DELETE old
+            WITH DISTINCT n, row
+            UNWIND row.ancestors AS aid
+            MATCH (a:Community {{id: aid}})
+            CREATE (n)-[:BELONGS_TO {{generation: row.generation}}]->(a)
+        """, [
+            {
+                "eid": eid,
+                "levels": {f"community_level_{lvl}": chains[comm].get(lvl) for lvl in moved},
+                "ancestors": [community_node_id(generation, lvl, a) for lvl, a in chains[comm].items()],
+                "generation": generation,
+            }
+            for eid, comm in rechained
+        ])
+
+    with driver.session() as session:
+        session.run("""
+            MATCH (c:Community {level: $level, generation: $generation}) WHERE c.community_id IN $emptied
+            DETACH DELETE c
+        """, {"level": level, "generation": generation, "emptied": emptied})
+
+        # Deleted nodes drop their BELONGS_TO; recount from the degree store,
+        # then drop ancestors left without members
+        for lvl, comms in [(level, live)] + [
+            (lvl, sorted({chain[lvl] for chain in chains.values() if lvl in chain})) for lvl in moved
+        ]:
             session.run("""
-                CREATE (c:Community {
-                    id: $id,
-                    level: $level,
-                    community_id: $community_id,
-                    member_count: $member_count,
-                    type_distribution: $type_distribution,
-                    top_nodes: $top_nodes,
-                    node_type: '_community'
-                })
-            """, {
-                "id": comm["id"],
-                "level": comm["level"],
-                "community_id": comm["community_id"],
-                "member_count": comm["member_count"],
-                "type_distribution": json.dumps(comm["type_distribution"]),
-                "top_nodes": json.dumps(comm["top_nodes"]),
-            })
+                MATCH (c:Community {level: $level, generation: $generation}) WHERE c.community_id IN $comms
+                SET c.member_count = COUNT { (c)<-[:BELONGS_TO]-() }
+                WITH c WHERE c.member_count = 0 AND c.level > 0
+                DETACH DELETE c
+            """, {"level": lvl, "generation": generation, "comms": comms})
 
-            # Link members to community
-            session.run(f"""
-                MATCH (n) WHERE n.community_level_{level} = $comm_id
-                MATCH (c:Community {{id: $id}})
-                CREATE (n)-[:BELONGS_TO]->(c)
-            """, {"comm_id": comm["community_id"], "id": comm["id"]})
+        refresh_inter_community_edges(session, level, generation, live)
+        for lvl, comms in moved.items():
+            if comms:
+                refresh_inter_community_edges(session, lvl, generation, sorted(comms))
 
-        # Create inter-community edges
-        session.run(f"""
-            MATCH (a)-[r]->(b)
-            WHERE a.community_level_{level} IS NOT NULL
-              AND b.community_level_{level} IS NOT NULL
-              AND a.community_level_{level} <> b.community_level_{level}
-            WITH 'community_{level}_' + toString(a.community_level_{level}) AS src,
-                 'community_{level}_' + toString(b.community_level_{level}) AS tgt,
-                 count(r) AS edge_count
-            MATCH (c1:Community {{id: src}})
-            MATCH (c2:Community {{id: tgt}})
-            CREATE (c1)-[:INTER_COMMUNITY {{edge_count: edge_count, edge_type: '_inter_community'}}]->(c2)
-        """)
+        session.run("""
+            UNWIND $rows AS row
+            MATCH (c:Community {id: row.id})
+            OPTIONAL MATCH (c)-[:INTER_COMMUNITY]-(d:Community) WHERE d.x IS NOT NULL
+            WITH c, row, avg(d.x) AS x, avg(d.y) AS y
+            OPTIONAL MATCH (o:Community {id: row.origin})
+            SET c.x = coalesce(x, o.x), c.y = coalesce(y, o.y)
+        """, {"rows": [
+            {
+                "id": community_node_id(generation, level, c),
+                "origin": community_node_id(generation, level, origin[c]) if c in origin else None,
+            }
+            for c in created
+        ]})
+
+    summarize_communities(driver, [community_node_id(generation, level, c) for c in live])
+
+    # Published overview artifacts of the old revision are now stale
+    revision = new_generation()
+    with driver.session() as session:
+        session.run("""
+            MATCH (p:CommunityGeneration {id: 'current'})
+            SET p.revision = $revision, p.updated_at = datetime()
+        """, {"revision": revision})
 
-        print(f"Created {len(communities)} community nodes at level {level}.")
-        return communities
+    print(f"Updated {len(live)} communities ({len(emptied)} removed, {len(created)} new) "
+          f"from {len(changed_ids)} changed nodes.")
+    return revision
 
 
-def run_layout(driver, level: int = 0):
+def run_layout(driver, level: int = 0, generation: str = ""):
     """Compute ForceAtlas2 layout positions for community nodes using igraph."""
     import igraph as ig
 
     with driver.session() as session:
         # Get community nodes
         result = session.run(
-            "MATCH (c:Community {level: $level}) RETURN c.id AS id",
-            {"level": level},
+            "MATCH (c:Community {level: $level, generation: $generation}) RETURN c.id AS id",
+            {"level": level, "generation": generation},
         )
         comm_ids = [r["id"] for r in result]
         id_to_idx = {cid: i for i, cid in enumerate(comm_ids)}
 
         # Get inter-community edges
         result = session.run("""
-            MATCH (c1:Community {level: $level})-[r:INTER_COMMUNITY]->(c2:Community {level: $level})
+            MATCH (c1:Community {level: $level, generation: $generation})
+                  -[r:INTER_COMMUNITY]->(c2:Community {level: $level, generation: $generation})
             RETURN c1.id AS source, c2.id AS target, r.edge_count AS weight
-        """, {"level": level})
+        """, {"level": level, "generation": generation})
 
         edges = []
         weights = []
@@ -203,21 +1050,135 @@ def run_layout(driver, level: int = 0):
     layout = g.layout_fruchterman_reingold(weights=weights if weights else None, niter=500)
 
     # Write positions back
-    with driver.session() as session:
-        for idx, (x, y) in enumerate(layout.coords):
-            session.run(
-                "MATCH (c:Community {id: $id}) SET c.x = $x, c.y = $y",
-                {"id": comm_ids[idx], "x": float(x) * 100, "y": float(y) * 100},
-            )
+    write_batches(driver, """
+        UNWIND $rows AS row
+        MATCH (c:Community {id: row.id})
+        SET c.x = row.x, c.y = row.y
+    """, [
+        {"id": cid, "x": float(x) * 100, "y": float(y) * 100}
+        for cid, (x, y) in zip(comm_ids, layout.coords)
+    ])
 
     print(f"Layout computed for {len(comm_ids)} community nodes at level {level}.")
 
 
+def export_overview_artifacts(driver, generation: str, levels: int, out_dir: str,
+                              revision: str | None = None) -> dict:
+    """Write each level's community overview as static JSON for `generation`.
+
+    Elements match what /api/graph/communities returns from Neo4j, with the
+    type distribution and top nodes already decoded and communities ordered by
+    member_count. Files go under <out_dir>/<revision>/ (the generation unless
+    given). Returns the manifest to publish once the generation is live.
+    """
+    revision = revision or generation
+    gen_dir = os.path.join(out_dir, revision)
+    os.makedirs(gen_dir, exist_ok=True)
+
+    files = {}
+    with driver.session() as session:
+        for level in range(levels):
+            elements = []
+            result = session.run("""
+                MATCH (c:Community {level: $level, generation: $generation})
+                RETURN c ORDER BY c.member_count DESC
+            """, {"level": level, "generation": generation})
+            for r in result:
+                props = dict(r["c"])
+                top_nodes = json.loads(props.get("top_nodes") or "[]")
+                elements.append({
+                    "group": "nodes",
+                    "data": {
+                        "id": props["id"],
+                        "label": (top_nodes[0]["label"] if top_nodes
+                                  else f"Community {props['community_id']}"),
+                        "node_type": "_community",
+                        "level": level,
+                        "community_id": props["community_id"],
+                        "member_count": props.get("member_count", 0),
+                        "type_distribution": json.loads(props.get("type_distribution") or "{}"),
+                        "top_nodes": top_nodes,
+                        "doc_count": props.get("member_count", 0),
+                        "x": props.get("x"),
+                        "y": props.get("y"),
+                    },
+                })
+
+            result = session.run("""
+                MATCH (c1:Community {level: $level, generation: $generation})
+                      -[r:INTER_COMMUNITY]->(c2:Community {level: $level, generation: $generation})
+                RETURN c1.id AS source, c2.id AS target, r.edge_count AS edge_count
+            """, {"level": level, "generation": generation})
+            for r in result:
+                elements.append({
+                    "group": "edges",
+                    "data": {
+                        "id": f"{r['source']}-inter-{r['target']}",
+                        "source": r["source"],
+                        "target": r["target"],
+                        "edge_type": "_inter_community",
+                        "edge_count": r["edge_count"],
+                    },
+                })
+
+            name = f"level-{level}.json"
+            write_json(os.path.join(gen_dir, name), {
+                "generation": generation,
+                "level": level,
+                "elements": elements,
+            })
+            files[str(level)] = f"{revision}/{name}"
+
+    print(f"Wrote community overview artifacts for {levels} levels to {gen_dir}.")
+    return {"generation": generation, "revision": revision, "levels": levels, "files": files}
+
+
+def publish_overview_artifacts(out_dir: str, manifest: dict, keep: int = 0):
+    """Point current.json at the manifest's revision and prune older ones."""
+    publish(out_dir, manifest, manifest["revision"], keep)
+    print(f"Published community artifacts for generation {manifest['generation']} "
+          f"(revision {manifest['revision']}).")
+
+
+def unpublish_overview_artifacts(out_dir: str):
+    """Remove current.json so the web app stops serving artifacts."""
+    for name in ("current.json", "current.json.gz"):
+        path = os.path.join(out_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    print("Unpublished community artifacts.")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Community detection pipeline")
     parser.add_argument("--uri", default="bolt://localhost:7687", help="Neo4j URI")
     parser.add_argument("--levels", type=int, default=1, help="Number of hierarchy levels")
     parser.add_argument("--clear", action="store_true", help="Clear existing communities first")
+    parser.add_argument("--algorithm", choices=["louvain", "leiden"], default="louvain",
+                        help="Community detection backend (full runs)")
+    parser.add_argument("--resolution", type=float, default=1.0,
+                        help="Modularity resolution (higher gives more, smaller communities)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    parser.add_argument("--iterations", type=int, default=-1,
+                        help="Leiden iteration cap (-1 runs until stable)")
+    parser.add_argument("--level-factor", type=float, default=0.5,
+                        help="Resolution multiplier applied per hierarchy level")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-optimize communities around --changed node ids")
+    parser.add_argument("--changed", nargs="*", default=[],
+                        help="Ids of changed nodes and edge endpoints (for --incremental)")
+    parser.add_argument("--changed-file", help="File with one changed node id per line")
+    parser.add_argument("--edge-weights", help="JSON edge weight config (default: built-in)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes for per-component detection (default: CPU count)")
+    parser.add_argument("--collect", action="store_true",
+                        help="Only delete old community generations (run on a schedule, not inline)")
+    parser.add_argument("--keep-generations", type=int, default=1,
+                        help="Older community generations (and artifact builds) to keep for rollback")
+    parser.add_argument("--grace-minutes", type=float, default=GENERATION_GRACE_MINUTES,
+                        help="Keep generations replaced less than this long ago (for --collect)")
+    parser.add_argument("--artifacts-dir",
+                        help="Write static overview JSON here (e.g. ../web/public/data/communities)")
     args = parser.parse_args()
 
     driver = get_driver(args.uri)
@@ -233,18 +1194,69 @@ def main():
             print("No nodes in database. Skipping community detection.")
             sys.exit(0)
 
+        start = time.time()
+        if args.collect:
+            collect_old_generations(driver, args.keep_generations, args.grace_minutes)
+            return
+
+        edge_weights = load_edge_weights(args.edge_weights)
+
+        if args.incremental:
+            changed = list(args.changed)
+            if args.changed_file:
+                with open(args.changed_file) as f:
+                    changed.extend(line.strip() for line in f if line.strip())
+            revision = update_communities_incremental(
+                driver, changed, args.resolution, args.seed, args.iterations, edge_weights,
+            )
+            if revision and args.artifacts_dir:
+                generation = get_current_generation(driver)
+                with driver.session() as session:
+                    levels = session.run(
+                        "MATCH (c:Community {generation: $generation}) RETURN max(c.level) + 1 AS levels",
+                        {"generation": generation},
+                    ).single()["levels"]
+                manifest = export_overview_artifacts(
+                    driver, generation, levels, args.artifacts_dir, revision
+                )
+                publish_overview_artifacts(args.artifacts_dir, manifest, args.keep_generations)
+            print(f"Incremental community update complete in {time.time() - start:.1f}s.")
+            return
+
         if args.clear:
-            clear_communities(driver)
+            clear_communities(driver, args.levels)
+            if args.artifacts_dir:
+                unpublish_overview_artifacts(args.artifacts_dir)
 
-        start = time.time()
+        # Build a new generation alongside the live one
+        generation = new_generation()
+        print(f"Building community generation {generation}.")
 
         # Run community detection
-        run_louvain_igraph(driver)
+        detection = run_community_detection(
+            driver, args.algorithm, args.resolution, args.seed, args.iterations, args.levels,
+            args.level_factor, edge_weights, args.workers,
+        )
 
         # Create community nodes
-        for level in range(args.levels):
-            communities = create_community_nodes(driver, level)
-            run_layout(driver, level)
+        for level in range(detection["levels"]):
+            communities = create_community_nodes(driver, level, generation)
+            write_inter_community_edges(
+                driver, level, generation, detection["inter_community"][level]
+            )
+            run_layout(driver, level, generation)
+
+        link_community_hierarchy(driver, detection["parents"], generation)
+
+        if args.artifacts_dir:
+            manifest = export_overview_artifacts(
+                driver, generation, detection["levels"], args.artifacts_dir
+            )
+
+        # Cut readers over; old generations are left to --collect
+        activate_generation(driver, generation, detection["total_weight"])
+        if args.artifacts_dir:
+            publish_overview_artifacts(args.artifacts_dir, manifest, args.keep_generations)
 
         elapsed = time.time() - start
         print(f"Community detection complete in {elapsed:.1f}s.")
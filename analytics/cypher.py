@@ -0,0 +1,29 @@
+"""
+Cypher helpers shared by the analytics pipelines.
+"""
+
+# Rows per write transaction for UNWIND batches
+WRITE_BATCH_SIZE = 10000
+
+
+def _run_batch(tx, query: str, rows: list):
+    tx.run(query, {"rows": rows}).consume()
+
+
+def write_batches(driver, query: str, rows: list, batch_size: int = WRITE_BATCH_SIZE):
+    """Run an `UNWIND $rows AS row ...` write query in sized transactions."""
+    with driver.session() as session:
+        for start in range(0, len(rows), batch_size):
+            session.execute_write(_run_batch, query, rows[start:start + batch_size])
+
+
+# Binds `c` to the communities at $level of the generation the
+# (:CommunityGeneration {id: 'current'}) pointer names; without a pointer, only
+# legacy communities without a generation. Continue with WITH, MATCH or RETURN.
+# Mirrored by LIVE_COMMUNITIES in web/lib/graph-queries.ts.
+LIVE_COMMUNITIES = """
+    OPTIONAL MATCH (g:CommunityGeneration {id: 'current'})
+    WITH g
+    MATCH (c:Community {level: $level})
+    WHERE (g IS NULL AND c.generation IS NULL) OR c.generation = g.generation
+"""
@@ -0,0 +1,423 @@
+"""
+Vectorized ForceAtlas2 layout with Barnes-Hut repulsion.
+
+Follows the ForceAtlas2 model (Jacomy et al. 2014) used by Gephi and by
+graphology-layout-forceatlas2 in the web viewer: degree-weighted repulsion
+(mass = degree + 1), linear or LinLog attraction, normal or strong gravity and
+the adaptive global speed with per-node swinging. Defaults match the settings
+the Sigma canvas uses, so precomputed positions look like client-side ones.
+
+Repulsion is approximated with a quadtree built level by level in NumPy and
+walked for whole blocks of nodes at once; blocks can run on several threads
+since NumPy releases the GIL.
+
+multilevel_forceatlas2() handles graphs too large to lay out directly: it
+coarsens by heavy-edge matching, lays out the coarsest graph and refines
+back down, seeding each level from the one above.
+
+Usage:
+    from forceatlas2 import forceatlas2, multilevel_forceatlas2
+    pos = forceatlas2(n, edges, iterations=100)
+    pos = multilevel_forceatlas2(n, edges)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Nodes per Barnes-Hut traversal block (bounds pair-list memory)
+BLOCK_SIZE = 8192
+
+# Quadtree depth cap; deeper cells are treated as one body minus self
+MAX_DEPTH = 20
+
+# Below this node count repulsion is computed exactly
+EXACT_REPULSION_MAX_NODES = 500
+
+# Iterations before the convergence test applies (the adaptive speed starts low)
+CONVERGENCE_WARMUP = 20
+
+# Multilevel: stop coarsening at this size, or when a level shrinks too little
+COARSEST_SIZE = 1000
+MIN_COARSENING_RATIO = 0.95
+
+# Heavy-edge matching rounds per coarsening level
+MATCHING_ROUNDS = 3
+
+
+def _build_quadtree(pos: np.ndarray, mass: np.ndarray, max_depth: int = MAX_DEPTH) -> list:
+    """Per level: (sorted cell keys, node -> cell index, mass, center of mass, count, cell size)."""
+    lo = pos.min(axis=0)
+    span = float((pos.max(axis=0) - lo).max()) * 1.0001 or 1.0
+    unit = (pos - lo) / span
+
+    levels = []
+    for depth in range(max_depth + 1):
+        k = 1 << depth
+        cell = np.minimum((unit * k).astype(np.int64), k - 1)
+        keys, inv = np.unique(cell[:, 0] * k + cell[:, 1], return_inverse=True)
+        cell_mass = np.bincount(inv, weights=mass)
+        com = np.column_stack((
+            np.bincount(inv, weights=mass * pos[:, 0]),
+            np.bincount(inv, weights=mass * pos[:, 1]),
+        )) / cell_mass[:, None]
+        count = np.bincount(inv)
+        levels.append((keys, inv, cell_mass, com, count, span / k))
+        if count.max() == 1:
+            break
+    return levels
+
+
+def _repulsion_block(block: np.ndarray, pos: np.ndarray, mass: np.ndarray, levels: list,
+                     theta: float, kr: float) -> np.ndarray:
+    """Barnes-Hut repulsion on the nodes in `block`, walking all of them at once."""
+    force = np.zeros((len(block), 2))
+    theta2 = theta * theta
+
+    # (local node index, cell index) pairs still to resolve at this level
+    local = np.arange(len(block))
+    cells = np.zeros(len(block), dtype=np.int64)
+
+    for depth, (keys, inv, cell_mass, com, count, size) in enumerate(levels):
+        nodes = block[local]
+        delta = pos[nodes] - com[cells]
+        d2 = np.maximum((delta * delta).sum(axis=1), 1e-12)
+        own = inv[nodes] == cells
+        last = depth == len(levels) - 1
+
+        accept = ~own & ((count[cells] == 1) | (size * size < theta2 * d2) | last)
+        if last:
+            # Unsplittable cell holding the node itself: use the rest of it
+            rest = own & (count[cells] > 1)
+            rest_mass = cell_mass[cells[rest]] - mass[nodes[rest]]
+            rest_com = (
+                com[cells[rest]] * cell_mass[cells[rest]][:, None]
+                - pos[nodes[rest]] * mass[nodes[rest]][:, None]
+            ) / np.maximum(rest_mass, 1e-12)[:, None]
+            rest_delta = pos[nodes[rest]] - rest_com
+            rest_d2 = np.maximum((rest_delta * rest_delta).sum(axis=1), 1e-12)
+            f = (kr * mass[nodes[rest]] * rest_mass / rest_d2)[:, None] * rest_delta
+            force[:, 0] += np.bincount(local[rest], weights=f[:, 0], minlength=len(block))
+            force[:, 1] += np.bincount(local[rest], weights=f[:, 1], minlength=len(block))
+
+        f = (kr * mass[nodes[accept]] * cell_mass[cells[accept]] / d2[accept])[:, None] * delta[accept]
+        force[:, 0] += np.bincount(local[accept], weights=f[:, 0], minlength=len(block))
+        force[:, 1] += np.bincount(local[accept], weights=f[:, 1], minlength=len(block))
+
+        if last:
+            break
+
+        # Open the remaining cells (a node alone in its own cell is done)
+        open_ = ~accept & ~(own & (count[cells] == 1))
+        local = local[open_]
+        parent = keys[cells[open_]]
+        k = 1 << depth
+        px, py = parent // k, parent % k
+        child_keys = levels[depth + 1][0]
+        candidates = np.concatenate([
+            (2 * px + dx) * (2 * k) + (2 * py + dy) for dx in (0, 1) for dy in (0, 1)
+        ])
+        local = np.tile(local, 4)
+        found = np.searchsorted(child_keys, candidates)
+        found = np.minimum(found, len(child_keys) - 1)
+        valid = child_keys[found] == candidates
+        local = local[valid]
+        cells = found[valid]
+        if len(local) == 0:
+            break
+
+    return force
+
+
+def _repulsion(pos: np.ndarray, mass: np.ndarray, kr: float, barnes_hut: bool, theta: float,
+               executor: ThreadPoolExecutor | None) -> np.ndarray:
+    n = len(pos)
+    # Exact blocks materialize block x n pairs, so keep them smaller
+    block_size = BLOCK_SIZE if barnes_hut else max(1, 4_000_000 // n)
+    blocks = [np.arange(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+
+    if barnes_hut:
+        levels = _build_quadtree(pos, mass)
+
+        def work(block):
+            return _repulsion_block(block, pos, mass, levels, theta, kr)
+    else:
+        def work(block):
+            delta = pos[block][:, None, :] - pos[None, :, :]
+            d2 = (delta * delta).sum(axis=2)
+            d2[np.arange(len(block)), block] = np.inf
+            d2 = np.maximum(d2, 1e-12)
+            factor = kr * mass[block][:, None] * mass[None, :] / d2
+            return (factor[:, :, None] * delta).sum(axis=1)
+
+    if executor is None or len(blocks) == 1:
+        return np.concatenate([work(b) for b in blocks])
+    return np.concatenate(list(executor.map(work, blocks)))
+
+
+def forceatlas2(n: int, edges, weights=None, pos=None, iterations: int = 100,
+                gravity: float = 1.0, scaling_ratio: float = 10.0, strong_gravity: bool = True,
+                lin_log: bool = False, outbound_attraction_distribution: bool = False,
+                edge_weight_influence: float = 1.0, jitter_tolerance: float = 1.0,
+                slow_down: float = 5.0, barnes_hut: bool | None = None, theta: float = 1.2,
+                tolerance: float = 1e-3, threads: int = 1, seed: int | None = None,
+                mobility=None, equilibrium=None, mass=None,
+                progress_every: int = 0, stats: dict | None = None) -> np.ndarray:
+    """Run ForceAtlas2 on `n` nodes and (source, target) index `edges`.
+
+    Returns an (n, 2) array of positions. `pos` seeds the layout (random in a
+    disc of radius 500 otherwise, like the web canvas). `barnes_hut` defaults
+    to on above EXACT_REPULSION_MAX_NODES nodes. Iteration stops early once
+    the mean node displacement falls below `tolerance` times the layout's RMS
+    spread. `mobility` scales each node's movement: 0 pins a node, values
+    between 0 and 1 damp it. Nodes flagged in the `equilibrium` mask have
+    their starting net force subtracted throughout, so a node that was at
+    rest in a larger layout only reacts to what changed. `progress_every`
+    prints a status line every that many iterations. `mass` overrides the
+    default degree + 1 node masses. If given, `stats["iterations"]` is
+    increased by the iterations run.
+    """
+    rng = np.random.default_rng(seed)
+    if pos is None:
+        radius = 500 * np.sqrt(rng.uniform(size=n))
+        angle = rng.uniform(0, 2 * np.pi, size=n)
+        pos = np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+    else:
+        pos = np.array(pos, dtype=np.float64).reshape(n, 2)
+    if n <= 1:
+        return pos
+    mobility = np.ones(n) if mobility is None else np.asarray(mobility, dtype=np.float64)
+    moving = mobility > 0
+    if not moving.any():
+        return pos
+
+    # Coincident nodes feel identical forces forever; nudge duplicates apart
+    _, first = np.unique(pos, axis=0, return_index=True)
+    if len(first) < n:
+        duplicate = moving.copy()
+        duplicate[first] = False
+        scale = float(np.ptp(pos, axis=0).max()) or 1.0
+        pos[duplicate] += rng.normal(scale=1e-3 * scale, size=(int(duplicate.sum()), 2))
+
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    src, tgt = edges[:, 0], edges[:, 1]
+    w = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+    if edge_weight_influence != 1.0:
+        w = w ** edge_weight_influence
+
+    if mass is None:
+        mass = 1.0 + np.bincount(src, minlength=n) + np.bincount(tgt, minlength=n)
+    else:
+        mass = np.asarray(mass, dtype=np.float64)
+    if barnes_hut is None:
+        barnes_hut = n > EXACT_REPULSION_MAX_NODES
+
+    speed = 1.0
+    speed_efficiency = 1.0
+    prev_force = np.zeros_like(pos)
+    baseline = None
+    executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+    start = time.time()
+
+    it = -1
+    try:
+        for it in range(iterations):
+            force = _repulsion(pos, mass, scaling_ratio, barnes_hut, theta, executor)
+
+            # Gravity toward the origin
+            dist = np.sqrt((pos * pos).sum(axis=1))
+            if strong_gravity:
+                force -= (gravity * mass)[:, None] * pos
+            else:
+                force -= (gravity * mass / np.maximum(dist, 1e-12))[:, None] * pos
+
+            # Attraction along edges
+            delta = pos[src] - pos[tgt]
+            if lin_log:
+                d = np.maximum(np.sqrt((delta * delta).sum(axis=1)), 1e-12)
+                factor = w * np.log1p(d) / d
+            else:
+                factor = w.copy()
+            if outbound_attraction_distribution:
+                factor /= mass[src] / mass.mean()
+            pull = factor[:, None] * delta
+            for axis in (0, 1):
+                force[:, axis] -= np.bincount(src, weights=pull[:, axis], minlength=n)
+                force[:, axis] += np.bincount(tgt, weights=pull[:, axis], minlength=n)
+
+            if equilibrium is not None:
+                if baseline is None:
+                    baseline = force * np.asarray(equilibrium, dtype=bool)[:, None]
+                force -= baseline
+
+            # Pinned nodes take no part in the speed estimate either
+            force *= mobility[:, None]
+
+            # Adaptive speed (Gephi's swinging / traction model)
+            swinging = mass * np.sqrt(((force - prev_force) ** 2).sum(axis=1))
+            traction = mass * np.sqrt(((force + prev_force) ** 2).sum(axis=1)) / 2
+            total_swinging = swinging.sum()
+            total_traction = traction.sum()
+
+            estimated_jitter = 0.05 * np.sqrt(n)
+            jitter = jitter_tolerance * max(
+                np.sqrt(estimated_jitter),
+                min(10.0, estimated_jitter * total_traction / n ** 2),
+            )
+            if total_traction > 0 and total_swinging / total_traction > 2.0:
+                if speed_efficiency > 0.05:
+                    speed_efficiency *= 0.5
+                jitter = max(jitter, jitter_tolerance)
+            target_speed = (
+                jitter * speed_efficiency * total_traction / total_swinging
+                if total_swinging > 0 else speed
+            )
+            if total_swinging > jitter * total_traction:
+                if speed_efficiency > 0.05:
+                    speed_efficiency *= 0.7
+            elif speed < 1000:
+                speed_efficiency *= 1.3
+            speed += min(target_speed - speed, 0.5 * speed)
+
+            step = (speed / (1 + np.sqrt(speed * swinging)) / slow_down)[:, None] * force
+            pos = pos + step
+            prev_force = force
+
+            displacement = np.sqrt((step[moving] ** 2).sum(axis=1)).mean()
+            rms_radius = float(np.sqrt((pos.var(axis=0)).sum())) or 1.0
+            if progress_every and (it + 1) % progress_every == 0:
+                print(f"  FA2 iteration {it + 1}/{iterations}: "
+                      f"displacement={displacement / rms_radius:.2e}, {time.time() - start:.1f}s")
+            if it >= CONVERGENCE_WARMUP and displacement < tolerance * rms_radius:
+                if progress_every:
+                    print(f"  FA2 converged after {it + 1} iterations.")
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if stats is not None:
+            stats["iterations"] = stats.get("iterations", 0) + it + 1
+
+    return pos
+
+
+def _heaviest_neighbour(n: int, src: np.ndarray, tgt: np.ndarray, score: np.ndarray,
+                        tie: np.ndarray) -> np.ndarray:
+    """Best-scoring neighbour per node over directed (src, tgt) pairs; -1 if none."""
+    best = np.full(n, -1, dtype=np.int64)
+    if len(src) == 0:
+        return best
+    order = np.lexsort((-tie, -score, src))
+    first = np.unique(src[order], return_index=True)[1]
+    best[src[order][first]] = tgt[order][first]
+    return best
+
+
+def coarsen(n: int, edges: np.ndarray, weights: np.ndarray, mass: np.ndarray):
+    """One heavy-edge coarsening step.
+
+    Nodes are paired with their heaviest unmatched neighbour over a few
+    rounds (edge weight normalized by both masses, so hubs do not swallow
+    everything); nodes still unmatched then join their heaviest matched
+    neighbour's group, which collapses star leaves that matching alone cannot.
+
+    Returns (cluster of each node, coarse node count, coarse edges, coarse
+    weights, coarse masses).
+    """
+    src = np.concatenate((edges[:, 0], edges[:, 1]))
+    tgt = np.concatenate((edges[:, 1], edges[:, 0]))
+    w = np.concatenate((weights, weights))
+    score = w / (mass[src] * mass[tgt])
+    # Symmetric random tie-break: on uniform graphs every locally heaviest
+    # edge is then chosen from both ends, so matching always progresses
+    tie = np.random.default_rng(len(edges)).random(len(edges))
+    tie = np.concatenate((tie, tie))
+
+    partner = np.full(n, -1, dtype=np.int64)
+    for _ in range(MATCHING_ROUNDS):
+        free = (partner[src] < 0) & (partner[tgt] < 0)
+        choice = _heaviest_neighbour(n, src[free], tgt[free], score[free], tie[free])
+        nodes = np.flatnonzero(choice >= 0)
+        mutual = nodes[choice[choice[nodes]] == nodes]
+        if len(mutual) == 0:
+            break
+        partner[mutual] = choice[mutual]
+
+    # Matched pairs share the lower id as their representative
+    node = np.arange(n)
+    rep = np.where(partner >= 0, np.minimum(node, partner), node)
+    lonely = np.flatnonzero(partner < 0)
+    if len(lonely):
+        # Only onto matched neighbours, so representatives never chain
+        onto = partner[tgt] >= 0
+        choice = _heaviest_neighbour(n, src[onto], tgt[onto], score[onto], tie[onto])
+        attach = lonely[choice[lonely] >= 0]
+        rep[attach] = rep[choice[attach]]
+
+    roots, cluster = np.unique(rep, return_inverse=True)
+    m = len(roots)
+    coarse_mass = np.bincount(cluster, weights=mass, minlength=m)
+
+    a, b = cluster[edges[:, 0]], cluster[edges[:, 1]]
+    keep = a != b
+    lo, hi = np.minimum(a[keep], b[keep]), np.maximum(a[keep], b[keep])
+    keys, inv = np.unique(lo * m + hi, return_inverse=True)
+    coarse_edges = np.column_stack((keys // m, keys % m))
+    coarse_weights = np.bincount(inv, weights=weights[keep], minlength=len(keys))
+    return cluster, m, coarse_edges, coarse_weights, coarse_mass
+
+
+def multilevel_forceatlas2(n: int, edges, weights=None, iterations: int = 100,
+                           refine_iterations: int = 30, coarsest_size: int = COARSEST_SIZE,
+                           seed: int | None = None, progress_every: int = 0,
+                           stats: dict | None = None, **settings) -> np.ndarray:
+    """ForceAtlas2 through a heavy-edge coarsening hierarchy.
+
+    The coarsest graph gets `iterations` of ForceAtlas2; every finer level
+    starts from its parent's position plus a small jitter and gets
+    `refine_iterations`. Coarse nodes carry their members' summed masses and
+    edge weights. Other keyword settings go to forceatlas2() at every level;
+    `stats` collects the iteration total across levels and the level count.
+    """
+    rng = np.random.default_rng(seed)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    w = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+    mass = 1.0 + np.bincount(edges[:, 0], minlength=n) + np.bincount(edges[:, 1], minlength=n)
+
+    hierarchy = [(n, edges, w, mass)]
+    clusters = []
+    while hierarchy[-1][0] > coarsest_size:
+        level_n, level_edges, level_w, level_mass = hierarchy[-1]
+        cluster, m, coarse_edges, coarse_w, coarse_mass = coarsen(level_n, level_edges, level_w, level_mass)
+        if m > MIN_COARSENING_RATIO * level_n:
+            break
+        clusters.append(cluster)
+        hierarchy.append((m, coarse_edges, coarse_w, coarse_mass))
+        if progress_every:
+            print(f"  Coarsened to {m} nodes, {len(coarse_edges)} edges")
+
+    pos = None
+    for depth in range(len(hierarchy) - 1, -1, -1):
+        level_n, level_edges, level_w, level_mass = hierarchy[depth]
+        if pos is not None:
+            # Children start on their parent, spread by a fraction of a typical edge
+            parent = pos[clusters[depth]]
+            if len(hierarchy[depth + 1][1]):
+                ce = hierarchy[depth + 1][1]
+                spread = np.median(np.sqrt(((pos[ce[:, 0]] - pos[ce[:, 1]]) ** 2).sum(axis=1)))
+            else:
+                spread = 1.0
+            pos = parent + rng.normal(scale=0.1 * spread, size=(level_n, 2))
+        if progress_every:
+            print(f"  Level {depth}: {level_n} nodes")
+        pos = forceatlas2(
+            level_n, level_edges, level_w, pos=pos, mass=level_mass,
+            iterations=iterations if depth == len(hierarchy) - 1 else refine_iterations,
+            seed=None if seed is None else seed + depth, progress_every=progress_every,
+            stats=stats, **settings,
+        )
+    if stats is not None:
+        stats["levels"] = len(hierarchy)
+    return pos
@@ -6,13 +6,34 @@ Scans Neo4j to discover:
 - Edge types (relationship types)
 - Auto-assigns colors and shapes
 
+With --sample N, node types and their counts come from the labels in the
+count store, and only subtype and status frequencies are profiled from up
+to N nodes of each type; those become estimates whose 95% error bounds are
+kept in metadata.sampleErrors, while type, node and relationship counts
+stay exact. A type with no subtype values in the sample keeps its previous
+entry.
+
+The config records a fingerprint of the schema (labels, relationship types,
+node and edge types, plus subtype values and statuses from a full scan).
+When it matches the existing file, the file is left untouched so downstream
+caches stay warm; otherwise entries for unchanged types are carried over as
+they were. A sampled run's fingerprint comes from the count store alone, so
+an unchanged catalog skips the sample as well; run without --sample to pick
+up new subtype values or statuses.
+
 Usage:
     python generate_config.py [--uri bolt://localhost:7687] [--output ../web/public/data/graph-config.json]
+                              [--sample 100000] [--force]
 """
 
 import argparse
+import hashlib
 import json
+import math
+import os
+import random
 import sys
+import time
 from collections import Counter
 
 from neo4j import GraphDatabase
@@ -32,6 +53,20 @@ EDGE_COLORS = [
 
 SHAPES = ["ellipse", "diamond", "hexagon", "rectangle", "triangle", "star"]
 
+# Properties tried in order as a node type's subtype field
+SUBTYPE_FIELDS = ["role", "org_type", "location_type", "category", "type", "subtype"]
+
+# Sampling: ids per lookup query, and a cap on lookups per sampled node
+PROBE_BATCH = 5000
+MAX_PROBES_PER_SAMPLE = 50
+
+# Labels and relationship types written by the app and analytics pipelines
+INTERNAL_LABELS = ("Community", "CommunityGeneration", "View")
+INTERNAL_REL_TYPES = ("BELONGS_TO", "INTER_COMMUNITY", "PARENT_OF")
+
+# z for 95% confidence intervals on sampled estimates
+Z_95 = 1.96
+
 STATUS_STYLES = {
     "convicted": {"color": "red", "label": "Convicted"},
     "charged": {"color": "orange", "label": "Charged"},
@@ -48,70 +83,327 @@ def get_driver(uri: str):
     return GraphDatabase.driver(uri, auth=("", ""))
 
 
-def discover_schema(driver):
-    """Discover node types, edge types, and property distributions."""
+def timed_run(session, timings: dict, name: str, query: str, params: dict | None = None) -> list:
+    """Run a query to completion, recording its wall time in ms under `name`."""
+    start = time.perf_counter()
+    records = list(session.run(query, params or {}))
+    timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+    return records
+
+
+def label_node_types(session, timings: dict, labels: list) -> dict:
+    """Exact node counts per node type label, from the count store.
+
+    A label is a node type when its nodes carry it as their node_type; meta
+    and secondary labels sit on nodes of another type and are skipped.
+    """
+    counts = {}
+    for label in labels:
+        if label in INTERNAL_LABELS:
+            continue
+        first = timed_run(session, timings, "node_type_probes",
+                          f"MATCH (n:`{label}`) RETURN n.node_type AS type LIMIT 1")
+        if first and first[0]["type"] == label:
+            counts[label] = timed_run(session, timings, "node_type_counts",
+                                      f"MATCH (n:`{label}`) RETURN count(n) AS c")[0]["c"]
+    return dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def sample_node_rows(session, timings: dict, fields: list, quota: int, node_types: dict,
+                     total_nodes: int, seed: int | None = None) -> tuple[list, dict] | None:
+    """Sample up to `quota` nodes of every node type label.
+
+    Types with at most `quota` nodes are read whole. Larger types common
+    enough to be hit once per MAX_PROBES_PER_SAMPLE probes share one stream of
+    uniform element id lookups: element ids of record-store nodes end in a
+    dense numeric id after a per-database prefix, so ids are built from one
+    real element id's prefix, after widening the numeric range until a batch
+    of probes past it finds nothing. Rarer large types are Bernoulli-sampled
+    from their label scan at quota / count (not reproducible by --seed).
+
+    Returns rows shaped like the full aggregation (type, field, value, count)
+    and the nodes sampled per type, or None when element ids have another
+    format.
+    """
+    rng = random.Random(seed)
+    aggregate = """
+        UNWIND [[null, null]] + [f IN $fields WHERE n[f] IS NOT NULL | [f, n[f]]] AS pair
+        RETURN pair[0] AS field, pair[1] AS value, count(*) AS count
+    """
+    counts = Counter()
+    sizes = {}
+    probed = []
+    for nt, count in node_types.items():
+        if count <= quota or count * MAX_PROBES_PER_SAMPLE < total_nodes:
+            where = "" if count <= quota else "WHERE rand() < $p"
+            rows = timed_run(session, timings, "sample_labels", f"MATCH (n:`{nt}`) {where} {aggregate}",
+                             {"fields": fields, "p": quota / count})
+            sizes[nt] = 0
+            for r in rows:
+                if r["field"] is None:
+                    sizes[nt] = r["count"]
+                counts[(nt, r["field"], _hashable(r["value"]))] += r["count"]
+        else:
+            probed.append(nt)
+    if not probed:
+        return _rows(counts), sizes
+
+    first = timed_run(session, timings, "sample_bounds", "MATCH (n) RETURN elementId(n) AS eid LIMIT 1")
+    prefix, _, number = first[0]["eid"].rpartition(":")
+    if not prefix or not number.isdigit():
+        return None
+    probe = """
+        UNWIND $ids AS eid
+        MATCH (n) WHERE elementId(n) = eid
+        RETURN n.node_type AS type, [f IN $fields WHERE n[f] IS NOT NULL | [f, n[f]]] AS pairs
+    """
+
+    def element_ids(numbers):
+        return [f"{prefix}:{i}" for i in numbers]
+
+    bound = max(total_nodes, 1)
+    while True:
+        ids = element_ids(rng.sample(range(bound, 2 * bound), min(PROBE_BATCH, bound)))
+        if not timed_run(session, timings, "sample_bounds", probe, {"ids": ids, "fields": fields}):
+            break
+        bound *= 2
+
+    open_types = set(probed)
+    sizes.update((nt, 0) for nt in probed)
+    seen = set()
+    max_probes = min(bound, quota * MAX_PROBES_PER_SAMPLE)
+    while open_types and len(seen) < max_probes:
+        batch = []
+        while len(batch) < PROBE_BATCH and len(seen) < max_probes:
+            i = rng.randrange(bound)
+            if i not in seen:
+                seen.add(i)
+                batch.append(i)
+        found = timed_run(session, timings, "sample_probes", probe,
+                          {"ids": element_ids(batch), "fields": fields})
+        for r in found:
+            nt = r["type"]
+            if nt not in open_types:
+                continue
+            sizes[nt] += 1
+            if sizes[nt] == quota:
+                open_types.discard(nt)
+            counts[(nt, None, None)] += 1
+            for field, value in r["pairs"]:
+                counts[(nt, field, _hashable(value))] += 1
+
+    return _rows(counts), sizes
+
+
+def _rows(counts: Counter) -> list:
+    return [{"type": t, "field": f, "value": v, "count": c} for (t, f, v), c in counts.items()]
+
+
+def _hashable(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _display(value) -> str:
+    """Config key for a property value; list values were made tuples by _hashable."""
+    return ", ".join(map(str, value)) if isinstance(value, tuple) else str(value)
+
+
+def _estimate(count: int, sampled: int, total: int) -> tuple[int, float]:
+    """Scale a sample count to the population, with its variance (zero for a census)."""
+    if sampled >= total:
+        return count, 0.0
+    p = count / sampled
+    return round(p * total), p * (1 - p) / sampled * total * total
+
+
+def _half_width(variance: float) -> int:
+    """95% normal-approximation half-width."""
+    return math.ceil(Z_95 * math.sqrt(variance))
+
+
+def discover_catalog(driver, sample: int | None = None) -> dict:
+    """Labels, relationship types and exact totals, all from the count store.
+
+    Relationship counts are one lookup per type. When `sample` will be used,
+    node types and their counts come from labels here too, so everything a
+    sampled run's fingerprint covers is known before any node is read.
+    """
+    timings = {}
+    with driver.session() as session:
+        total_nodes = timed_run(session, timings, "node_total", "MATCH (n) RETURN count(n) AS c")[0]["c"]
+        labels = [r["label"] for r in timed_run(session, timings, "labels", "CALL db.labels()")]
+        rel_types = [r["relationshipType"] for r in timed_run(
+            session, timings, "relationship_types", "CALL db.relationshipTypes()")]
+        edge_counts = {}
+        for t in rel_types:
+            edge_counts[t] = timed_run(session, timings, "edge_counts", f"""
+                MATCH ()-[r:`{t}`]->() RETURN count(r) AS c
+            """)[0]["c"]
+        node_types = None
+        if sample and sample < total_nodes:
+            node_types = label_node_types(session, timings, labels)
+
+    return {
+        "labels": labels,
+        "rel_types": rel_types,
+        "node_types": node_types,
+        "edge_types": {
+            t: c for t, c in sorted(edge_counts.items(), key=lambda kv: kv[1], reverse=True)
+            if c and t not in INTERNAL_REL_TYPES
+        },
+        "total_nodes": total_nodes,
+        "total_edges": sum(edge_counts.values()),
+        "timings": timings,
+    }
+
+
+def discover_schema(driver, catalog: dict, sample: int | None = None, seed: int | None = None):
+    """Discover node types, subtypes and statuses on top of `catalog`.
+
+    Nodes are scanned once: every node contributes a (type, None, None) row
+    and one row per candidate field it has, so type counts, subtype values
+    and statuses come out of a single aggregation.
+
+    With `sample` (when the catalog has label node types), the field rows
+    come from up to `sample` nodes per node type instead; subtype and status
+    counts are then scaled per type and `errors` holds the sample sizes and
+    95% half-widths. Statuses of nodes without a node type label are missed.
+    """
+    timings = dict(catalog["timings"])
+    exact_total = catalog["total_nodes"]
     with driver.session() as session:
-        # Get node labels and counts
-        node_types = {}
-        result = session.run("""
-            MATCH (n)
-            WHERE n.node_type IS NOT NULL
-            RETURN n.node_type AS type, count(n) AS count
-            ORDER BY count DESC
-        """)
-        for record in result:
-            node_types[record["type"]] = record["count"]
-
-        # Get edge types and counts
-        edge_types = {}
-        result = session.run("""
-            MATCH ()-[r]->()
-            RETURN type(r) AS type, count(r) AS count
-            ORDER BY count DESC
-        """)
-        for record in result:
-            t = record["type"]
-            if t not in ("BELONGS_TO", "INTER_COMMUNITY"):
-                edge_types[t] = record["count"]
-
-        # For each node type, discover subtypes
-        subtype_info = {}
-        for nt in node_types:
-            # Try common subtype fields
-            for field in ["role", "org_type", "location_type", "category", "type", "subtype"]:
-                result = session.run(f"""
-                    MATCH (n {{node_type: $nt}})
-                    WHERE n.{field} IS NOT NULL
-                    RETURN n.{field} AS subtype, count(n) AS count
-                    ORDER BY count DESC
-                    LIMIT 20
-                """, {"nt": nt})
-                subtypes = {r["subtype"]: r["count"] for r in result}
-                if subtypes:
-                    subtype_info[nt] = {"field": field, "values": subtypes}
-                    break
-
-        # Get status values
-        result = session.run("""
-            MATCH (n) WHERE n.status IS NOT NULL
-            RETURN DISTINCT n.status AS status
-        """)
-        statuses = [r["status"] for r in result]
-
-        # Total counts
-        total_nodes = session.run("MATCH (n) RETURN count(n) as c").single()["c"]
-        total_edges = session.run("MATCH ()-[r]->() RETURN count(r) as c").single()["c"]
+        fields = SUBTYPE_FIELDS + ["status"]
+        sampled = None
+        records = None
+        if catalog["node_types"] is not None:
+            rows = sample_node_rows(session, timings, fields, sample, catalog["node_types"],
+                                    exact_total, seed)
+            if rows is None:
+                print("  Element ids are not sampleable here; scanning all nodes instead.")
+            else:
+                records, sampled = rows
+        if records is None:
+            records = timed_run(session, timings, "node_aggregation", """
+                MATCH (n)
+                UNWIND [[null, null]] + [f IN $fields WHERE n[f] IS NOT NULL | [f, n[f]]] AS pair
+                RETURN n.node_type AS type, pair[0] AS field, pair[1] AS value, count(*) AS count
+            """, {"fields": fields})
+
+    node_types = Counter()
+    field_values = {}
+    statuses = Counter()
+    status_rows = Counter()
+    total_nodes = 0
+    for r in records:
+        if r["field"] is None:
+            total_nodes += r["count"]
+            if r["type"] is not None:
+                node_types[r["type"]] += r["count"]
+        elif r["field"] == "status":
+            statuses[_hashable(r["value"])] += r["count"]
+            status_rows[(r["type"], r["field"], _hashable(r["value"]))] += r["count"]
+        if r["field"] in SUBTYPE_FIELDS and r["type"] is not None:
+            field_values.setdefault(r["type"], {}).setdefault(r["field"], Counter())[_hashable(r["value"])] += r["count"]
+    node_types = dict(node_types.most_common())
+    if sampled is not None:
+        node_types = dict(catalog["node_types"])
+
+    # For each node type, the first candidate field it uses is its subtype
+    subtype_info = {}
+    for nt in node_types:
+        for field in SUBTYPE_FIELDS:
+            values = field_values.get(nt, {}).get(field)
+            if values:
+                subtype_info[nt] = {"field": field, "values": dict(values.most_common(20))}
+                break
+
+    errors = {}
+    if sampled is not None:
+        total_nodes = exact_total
+        errors = {"sample_sizes": sampled, "subtypes": {}, "statuses": {}}
+        for nt, info in subtype_info.items():
+            errors["subtypes"][nt] = {}
+            for v, c in info["values"].items():
+                info["values"][v], variance = _estimate(c, sampled[nt], node_types[nt])
+                errors["subtypes"][nt][v] = _half_width(variance)
+        # Status counts are per type; estimates add up and so do their variances
+        status_estimates = Counter()
+        status_variances = Counter()
+        for (nt, field, value), c in status_rows.items():
+            estimate, variance = _estimate(c, sampled[nt], node_types[nt])
+            status_estimates[value] += estimate
+            status_variances[value] += variance
+        statuses = status_estimates
+        errors["statuses"] = {st: _half_width(v) for st, v in status_variances.items()}
 
     return {
+        "labels": catalog["labels"],
+        "rel_types": catalog["rel_types"],
         "node_types": node_types,
-        "edge_types": edge_types,
+        "edge_types": catalog["edge_types"],
         "subtype_info": subtype_info,
-        "statuses": statuses,
+        "statuses": [s for s, _ in statuses.most_common()],
+        "status_counts": dict(statuses.most_common()),
         "total_nodes": total_nodes,
-        "total_edges": total_edges,
+        "total_edges": catalog["total_edges"],
+        "timings": timings,
+        "errors": errors,
     }
 
 
+def schema_fingerprint(schema) -> str:
+    """Hash of everything that shapes the config except counts, which drift constantly.
+
+    Labels, relationship types, node types and edge types are always exact.
+    Subtype values and statuses are only hashed when they come from a full
+    scan; sampled ones vary from run to run, so a sampled fingerprint covers
+    the catalog alone and is known before sampling.
+    """
+    shape = {
+        "labels": sorted(schema["labels"]),
+        "rel_types": sorted(schema["rel_types"]),
+        "node_types": sorted(str(nt) for nt in schema["node_types"]),
+        "edge_types": sorted(schema["edge_types"]),
+    }
+    if "subtype_info" in schema and not schema.get("errors"):
+        shape["subtypes"] = {
+            str(nt): [info["field"], sorted(str(v) for v in info["values"])]
+            for nt, info in schema["subtype_info"].items()
+        }
+        shape["statuses"] = sorted(str(st) for st in schema["statuses"])
+    return hashlib.sha256(json.dumps(shape, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def merge_unchanged(config: dict, previous: dict) -> dict:
+    """Carry over previous entries for types whose shape did not change.
+
+    Keeps colors, shapes and any hand edits stable for existing node types
+    (same subtype field and values, or no subtypes seen by a sample), edge
+    types and statuses.
+    """
+    sampled = "sampleErrors" in config["metadata"]
+    old_nodes = previous.get("nodeTypes", {})
+    for nt, entry in config["nodeTypes"].items():
+        old = old_nodes.get(nt)
+        if not old:
+            continue
+        if sampled and not entry["subtypes"]:
+            config["nodeTypes"][nt] = old
+        elif (old.get("subtypeField") == entry["subtypeField"]
+                and set(old.get("subtypes", {})) == set(entry["subtypes"])):
+            config["nodeTypes"][nt] = old
+    for section in ("edgeTypes", "statusStyles"):
+        old_section = previous.get(section, {})
+        for key in config[section]:
+            if key in old_section:
+                config[section][key] = old_section[key]
+    if sampled:
+        # A sample can miss rare statuses
+        for key, style in previous.get("statusStyles", {}).items():
+            config["statusStyles"].setdefault(key, style)
+    return config
+
+
 def generate_config(schema):
     """Generate graph-config.json from discovered schema."""
     config = {
@@ -123,8 +415,25 @@ def generate_config(schema):
             "nodeCount": schema["total_nodes"],
             "edgeCount": schema["total_edges"],
             "generated": True,
+            "schemaFingerprint": schema_fingerprint(schema),
         },
     }
+    errors = schema.get("errors")
+    if errors:
+        config["metadata"]["sampleSize"] = sum(errors["sample_sizes"].values())
+        config["metadata"]["sampleErrors"] = {
+            "confidence": 0.95,
+            "sampleSizes": errors["sample_sizes"],
+            "subtypes": {
+                nt: {_display(v): {"count": info["values"][v], "error": errors["subtypes"][nt][v]}
+                     for v in info["values"]}
+                for nt, info in schema["subtype_info"].items()
+            },
+            "statuses": {
+                _display(st): {"count": count, "error": errors["statuses"][st]}
+                for st, count in schema["status_counts"].items()
+            },
+        }
 
     # Generate node type configs
     for i, (nt, count) in enumerate(schema["node_types"].items()):
@@ -137,7 +446,8 @@ def generate_config(schema):
         if nt in schema["subtype_info"]:
             info = schema["subtype_info"][nt]
             subtype_field = info["field"]
-            for j, (st, st_count) in enumerate(info["values"].items()):
+            for j, (value, st_count) in enumerate(info["values"].items()):
+                st = _display(value)
                 color_idx = (i * 3 + j) % len(NODE_COLORS)
                 subtypes[st] = {
                     "color": NODE_COLORS[color_idx],
@@ -160,7 +470,7 @@ def generate_config(schema):
         }
 
     # Status styles from discovered statuses
-    for status in schema["statuses"]:
+    for status in map(_display, schema["statuses"]):
         if status not in config["statusStyles"]:
             config["statusStyles"][status] = {
                 "color": "zinc",
@@ -174,24 +484,65 @@ def main():
     parser = argparse.ArgumentParser(description="Generate graph config from Neo4j schema")
     parser.add_argument("--uri", default="bolt://localhost:7687", help="Neo4j URI")
     parser.add_argument("--output", default="../web/public/data/graph-config.json", help="Output path")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="Profile subtypes and statuses from up to this many sampled nodes per node type "
+                             "instead of scanning all")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for --sample")
+    parser.add_argument("--force", action="store_true",
+                        help="Rewrite the config even if the schema fingerprint is unchanged")
     args = parser.parse_args()
 
     driver = get_driver(args.uri)
 
     try:
-        print("Discovering schema...")
-        schema = discover_schema(driver)
+        previous = None
+        if os.path.exists(args.output):
+            try:
+                with open(args.output) as f:
+                    previous = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                previous = None
+        previous_fingerprint = (previous or {}).get("metadata", {}).get("schemaFingerprint")
 
+        print("Discovering schema...")
+        catalog = discover_catalog(driver, args.sample)
+
+        # A sampled fingerprint is fully known from the catalog: skip the sample too
+        if catalog["node_types"] is not None and not args.force:
+            fingerprint = schema_fingerprint(catalog)
+            if previous_fingerprint == fingerprint:
+                print(f"\nLabels, relationship and node types unchanged (fingerprint {fingerprint}); "
+                      f"{args.output} left as is.")
+                return
+
+        schema = discover_schema(driver, catalog, args.sample, args.seed)
+
+        if schema["errors"]:
+            errors = schema["errors"]
+            print(f"  Sampled {sum(errors['sample_sizes'].values())} nodes "
+                  f"(up to {args.sample} per type); estimated subtype counts (95%):")
+            for nt, info in schema["subtype_info"].items():
+                for value, count in info["values"].items():
+                    print(f"    {nt}.{info['field']}={value}: {count} ± {errors['subtypes'][nt][value]}")
         print(f"  Node types: {list(schema['node_types'].keys())}")
         print(f"  Edge types: {list(schema['edge_types'].keys())}")
         print(f"  Total: {schema['total_nodes']} nodes, {schema['total_edges']} edges")
+        for name, ms in schema["timings"].items():
+            print(f"  {name}: {ms:.1f}ms")
 
         config = generate_config(schema)
+        fingerprint = config["metadata"]["schemaFingerprint"]
+
+        if previous:
+            if previous_fingerprint == fingerprint and not args.force:
+                print(f"\nSchema unchanged (fingerprint {fingerprint}); {args.output} left as is.")
+                return
+            config = merge_unchanged(config, previous)
 
         with open(args.output, "w") as f:
             json.dump(config, f, indent=2)
 
-        print(f"\nConfig written to {args.output}")
+        print(f"\nConfig written to {args.output} (fingerprint {fingerprint})")
 
     finally:
         driver.close()
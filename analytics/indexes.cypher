@@ -14,6 +14,8 @@ CREATE INDEX IF NOT EXISTS FOR (n:Location) ON (n.label);
 CREATE INDEX IF NOT EXISTS FOR (n:Community) ON (n.id);
 CREATE INDEX IF NOT EXISTS FOR (n:Community) ON (n.level);
 CREATE INDEX IF NOT EXISTS FOR (n:Community) ON (n.community_id);
+CREATE INDEX IF NOT EXISTS FOR (n:Community) ON (n.generation);
+CREATE INDEX IF NOT EXISTS FOR (n:CommunityGeneration) ON (n.id);
 
 // View indexes
 CREATE INDEX IF NOT EXISTS FOR (n:View) ON (n.slug);
@@ -1,43 +1,111 @@
 """
-Pre-compute ForceAtlas2-style layout positions for nodes in Neo4j.
+Pre-compute ForceAtlas2 layout positions for nodes in Neo4j.
 
 Can compute layout for:
-- All nodes (full graph, for small graphs)
+- All nodes (full graph, multilevel for large graphs)
 - Individual communities (subgraph layout)
 - Community hierarchy nodes (overview layout)
+- Composed global coordinates: each community's member layout scaled by
+  its size and placed at the community's overview position
+
+The default engine is the native Barnes-Hut ForceAtlas2 in forceatlas2.py;
+graphs above --max-nodes switch to its multilevel variant. igraph's
+Fruchterman-Reingold and DrL remain available via --algorithm.
 
 Usage:
-    python layout.py [--uri bolt://localhost:7687] [--target all|communities|community_<id>]
+    python layout.py [--uri bolt://localhost:7687] [--target all|communities|composed|community_<id>]
+                     [--algorithm fa2|multilevel|fr|drl] [--iterations 100] [--threads 4]
+                     [--parallel] [--workers 8] [--incremental [--hops 1] [--damping 0.1]]
 """
 
 import argparse
+import os
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 import igraph as ig
+import numpy as np
 from neo4j import GraphDatabase
 
+from cypher import LIVE_COMMUNITIES, WRITE_BATCH_SIZE, write_batches
+from forceatlas2 import forceatlas2, multilevel_forceatlas2
+
+# igraph layouts come out in unit-ish coordinates; FA2 is already canvas scale
+IGRAPH_SCALE = 100
+
+# Element ids per neighbourhood expansion query in incremental mode
+EXPAND_BATCH_SIZE = 5000
+
+# Fraction of the typical gap between overview neighbours a community may fill
+COMPOSE_PACKING = 0.45
+
+# Communities sampled for the median nearest-neighbour gap
+COMPOSE_SAMPLE = 2000
+
 
 def get_driver(uri: str):
     return GraphDatabase.driver(uri, auth=("", ""))
 
 
-def layout_all_nodes(driver, max_nodes: int = 50000):
+def compute_layout(n: int, edges: list, algorithm: str = "fa2", settings: dict | None = None):
+    """Lay out `n` nodes with (source, target) index edges; returns [(x, y), ...].
+
+    `settings` are passed to forceatlas2() for the fa2 and multilevel engines
+    and ignored otherwise.
+    """
+    if n == 1:
+        return [(0.0, 0.0)]
+    if algorithm == "fa2":
+        return forceatlas2(n, edges, **(settings or {})).tolist()
+    if algorithm == "multilevel":
+        return multilevel_forceatlas2(n, edges, **(settings or {})).tolist()
+
+    g = ig.Graph(n=n, edges=edges, directed=True).as_undirected()
+    if algorithm == "drl":
+        layout = g.layout_drl(dim=2)
+    elif algorithm == "fr":
+        layout = g.layout_fruchterman_reingold(niter=500)
+    else:
+        raise ValueError(f"Unknown layout algorithm: {algorithm}")
+    return [(x * IGRAPH_SCALE, y * IGRAPH_SCALE) for x, y in layout.coords]
+
+
+def write_positions(driver, element_ids: list, coords, scale: float = 1,
+                    batch_size: int = WRITE_BATCH_SIZE):
+    """Write layout coordinates with UNWIND batches matched by element id."""
+    write_batches(driver, """
+        UNWIND $rows AS row
+        MATCH (n) WHERE elementId(n) = row.eid
+        SET n.x = row.x, n.y = row.y
+    """, [
+        {"eid": eid, "x": float(x) * scale, "y": float(y) * scale}
+        for eid, (x, y) in zip(element_ids, coords)
+    ], batch_size)
+
+
+def layout_all_nodes(driver, max_nodes: int = 50000, algorithm: str = "fa2",
+                     settings: dict | None = None):
     """Compute layout for all nodes in the graph."""
     with driver.session() as session:
         result = session.run("MATCH (n) RETURN count(n) as count")
         count = result.single()["count"]
 
-        if count > max_nodes:
-            print(f"Graph has {count} nodes, exceeding max {max_nodes}. Use community layout instead.")
-            return
+        if count > max_nodes and algorithm != "multilevel":
+            print(f"Graph has {count} nodes, exceeding {max_nodes}; using multilevel layout.")
+            algorithm = "multilevel"
 
-        # Export
-        node_result = session.run("MATCH (n) RETURN n.id AS id")
-        node_ids = [r["id"] for r in node_result]
+        # Export (element ids give an indexed lookup for write-back)
+        node_result = session.run(
+            "MATCH (n) WHERE NOT n:Community AND NOT n:CommunityGeneration "
+            "RETURN elementId(n) AS eid"
+        )
+        node_ids = [r["eid"] for r in node_result]
         id_to_idx = {nid: i for i, nid in enumerate(node_ids)}
 
-        edge_result = session.run("MATCH (a)-[r]->(b) RETURN a.id AS source, b.id AS target")
+        edge_result = session.run(
+            "MATCH (a)-[r]->(b) RETURN elementId(a) AS source, elementId(b) AS target"
+        )
         edges = []
         for r in edge_result:
             src = id_to_idx.get(r["source"])
@@ -45,43 +113,135 @@ def layout_all_nodes(driver, max_nodes: int = 50000):
             if src is not None and tgt is not None:
                 edges.append((src, tgt))
 
-    print(f"Computing layout for {len(node_ids)} nodes, {len(edges)} edges...")
-
-    g = ig.Graph(n=len(node_ids), edges=edges, directed=True)
-    g_undirected = g.as_undirected()
-
-    # Use Fruchterman-Reingold for medium graphs, DrL for large
-    if len(node_ids) > 10000:
-        layout = g_undirected.layout_drl(dim=2)
-    else:
-        layout = g_undirected.layout_fruchterman_reingold(niter=500)
+    print(f"Computing {algorithm} layout for {len(node_ids)} nodes, {len(edges)} edges...")
+    coords = compute_layout(len(node_ids), edges, algorithm, settings)
 
     # Write positions back
-    with driver.session() as session:
-        for idx, (x, y) in enumerate(layout.coords):
-            session.run(
-                "MATCH (n {id: $id}) SET n.x = $x, n.y = $y",
-                {"id": node_ids[idx], "x": float(x) * 100, "y": float(y) * 100},
-            )
+    write_positions(driver, node_ids, coords)
 
     print(f"Layout written for {len(node_ids)} nodes.")
 
 
-def layout_community(driver, community_id: str):
+def _expand(session, element_ids: list) -> list:
+    """Neighbours of `element_ids` (excluding community bookkeeping) with their positions."""
+    rows = []
+    for start in range(0, len(element_ids), EXPAND_BATCH_SIZE):
+        result = session.run("""
+            UNWIND $ids AS eid
+            MATCH (a) WHERE elementId(a) = eid
+            MATCH (a)--(b)
+            WHERE NOT b:Community AND NOT b:CommunityGeneration
+            RETURN eid AS source, elementId(b) AS target, b.x AS x, b.y AS y
+        """, {"ids": element_ids[start:start + EXPAND_BATCH_SIZE]})
+        rows.extend(r.data() for r in result)
+    return rows
+
+
+def layout_incremental(driver, hops: int = 1, damping: float = 0.1,
+                       settings: dict | None = None):
+    """Place unpositioned nodes without reshuffling the existing map.
+
+    Nodes lacking x/y start at the centroid of their positioned neighbours.
+    They and everything within `hops` of them are refined with ForceAtlas2;
+    existing nodes in that region move at `damping` speed and the ring just
+    outside it is pinned, so runtime follows the size of the change.
+    Gravity is off: without the rest of the map's repulsion it would drag
+    the region toward the origin.
+    """
+    with driver.session() as session:
+        result = session.run("""
+            MATCH (n)
+            WHERE (n.x IS NULL OR n.y IS NULL)
+              AND NOT n:Community AND NOT n:CommunityGeneration
+            RETURN elementId(n) AS eid
+        """)
+        new_ids = [r["eid"] for r in result]
+        if not new_ids:
+            print("No unpositioned nodes; layout unchanged.")
+            return
+
+        # Breadth-first over the region: hop 0 is the new nodes, the final
+        # ring is only loaded as pinned anchors
+        ring = {eid: 0 for eid in new_ids}
+        known = {}
+        edges = set()
+        frontier = new_ids
+        for hop in range(hops + 1):
+            next_frontier = []
+            for row in _expand(session, frontier):
+                src, tgt = row["source"], row["target"]
+                edges.add((src, tgt) if src < tgt else (tgt, src))
+                if row["x"] is not None and row["y"] is not None:
+                    known[tgt] = (row["x"], row["y"])
+                if tgt not in ring:
+                    ring[tgt] = hop + 1
+                    next_frontier.append(tgt)
+            frontier = next_frontier
+            if not frontier:
+                break
+
+    element_ids = list(ring)
+    index = {eid: i for i, eid in enumerate(element_ids)}
+    n = len(element_ids)
+    edge_list = [(index[a], index[b]) for a, b in edges]
+    new = np.array([ring[eid] == 0 for eid in element_ids])
+    mobility = np.array([
+        1.0 if ring[eid] == 0 else damping if ring[eid] <= hops else 0.0
+        for eid in element_ids
+    ])
+
+    # Seed new nodes from positioned neighbours, repeating so chains of new
+    # nodes inherit positions from further out
+    pos = np.zeros((n, 2))
+    placed = np.zeros(n, dtype=bool)
+    for eid, xy in known.items():
+        pos[index[eid]] = xy
+        placed[index[eid]] = True
+    src = np.array([a for a, _ in edge_list] + [b for _, b in edge_list], dtype=np.int64)
+    tgt = np.array([b for _, b in edge_list] + [a for a, _ in edge_list], dtype=np.int64)
+    while True:
+        ok = placed[tgt] & ~placed[src]
+        if not ok.any():
+            break
+        count = np.bincount(src[ok], minlength=n)
+        fill = count > 0
+        for axis in (0, 1):
+            pos[fill, axis] = np.bincount(src[ok], weights=pos[tgt[ok], axis], minlength=n)[fill] / count[fill]
+        placed |= fill
+
+    # Isolated new nodes (or an empty map) start near the existing centroid
+    rng = np.random.default_rng((settings or {}).get("seed"))
+    centre = pos[placed].mean(axis=0) if placed.any() else np.zeros(2)
+    pos[~placed] = centre
+    spread = float(np.ptp(pos[placed], axis=0).max()) if placed.sum() > 1 else 500.0
+    pos[new] += rng.normal(scale=0.01 * spread, size=(int(new.sum()), 2))
+
+    print(f"Refining {int(new.sum())} new nodes in a region of {n} nodes "
+          f"({int((mobility == 0).sum())} pinned), {len(edge_list)} edges...")
+    settings = {**(settings or {}), "gravity": 0.0}
+    coords = forceatlas2(n, edge_list, pos=pos, mobility=mobility, equilibrium=~new, **settings)
+
+    moved = mobility > 0
+    write_positions(driver, [eid for eid, m in zip(element_ids, moved) if m], coords[moved])
+    print(f"Layout written for {int(moved.sum())} nodes.")
+
+
+def layout_community(driver, community_id: str, algorithm: str = "fa2",
+                     settings: dict | None = None):
     """Compute layout for a single community's members."""
     with driver.session() as session:
         result = session.run("""
             MATCH (n)-[:BELONGS_TO]->(c:Community {id: $cid})
-            RETURN n.id AS id
+            RETURN elementId(n) AS eid
         """, {"cid": community_id})
-        node_ids = [r["id"] for r in result]
-        id_to_idx = {nid: i for i, nid in enumerate(node_ids)}
+        element_ids = [r["eid"] for r in result]
+        id_to_idx = {eid: i for i, eid in enumerate(element_ids)}
 
+        # Expand from the members' own relationships, not every edge in the graph
         edge_result = session.run("""
-            MATCH (a)-[r]->(b)
-            WHERE a.id IN $ids AND b.id IN $ids
-            RETURN a.id AS source, b.id AS target
-        """, {"ids": node_ids})
+            MATCH (c:Community {id: $cid})<-[:BELONGS_TO]-(a)-[r]->(b)-[:BELONGS_TO]->(c)
+            RETURN elementId(a) AS source, elementId(b) AS target
+        """, {"cid": community_id})
         edges = []
         for r in edge_result:
             src = id_to_idx.get(r["source"])
@@ -89,55 +249,247 @@ def layout_community(driver, community_id: str):
             if src is not None and tgt is not None:
                 edges.append((src, tgt))
 
-    if not node_ids:
+    if not element_ids:
         print(f"Community {community_id} has no members.")
         return
 
-    print(f"Computing layout for community {community_id}: {len(node_ids)} nodes, {len(edges)} edges...")
+    print(f"Computing layout for community {community_id}: {len(element_ids)} nodes, {len(edges)} edges...")
 
-    g = ig.Graph(n=len(node_ids), edges=edges, directed=True)
-    g_undirected = g.as_undirected()
-    layout = g_undirected.layout_fruchterman_reingold(niter=500)
-
-    with driver.session() as session:
-        for idx, (x, y) in enumerate(layout.coords):
-            session.run(
-                "MATCH (n {id: $id}) SET n.x = $x, n.y = $y",
-                {"id": node_ids[idx], "x": float(x) * 100, "y": float(y) * 100},
-            )
+    coords = compute_layout(len(element_ids), edges, algorithm, settings)
+    write_positions(driver, element_ids, coords)
 
     print(f"Layout written for community {community_id}.")
 
 
-def layout_all_communities(driver):
+def layout_all_communities(driver, level: int = 0, algorithm: str = "fa2",
+                           settings: dict | None = None):
     """Compute layout for every community's members."""
     with driver.session() as session:
-        result = session.run("MATCH (c:Community) RETURN c.id AS id ORDER BY c.member_count DESC")
+        result = session.run(LIVE_COMMUNITIES + """
+            RETURN c.id AS id ORDER BY c.member_count DESC
+        """, {"level": level})
         community_ids = [r["id"] for r in result]
 
     print(f"Computing layout for {len(community_ids)} communities...")
     for cid in community_ids:
-        layout_community(driver, cid)
+        layout_community(driver, cid, algorithm, settings)
+
+
+def _layout_subgraph(task):
+    """Process pool worker: layout of one community's edge list."""
+    n, edges, algorithm, settings = task
+    return compute_layout(n, edges, algorithm, settings)
+
+
+def fetch_community_subgraphs(driver, level: int = 0) -> dict:
+    """Stream every community's members and internal edges in one pass each.
+
+    Returns {community id: (member element ids, [(src_idx, tgt_idx), ...])}.
+    """
+    subgraphs = {}
+    index = {}
+    with driver.session() as session:
+        result = session.run(LIVE_COMMUNITIES + """
+            MATCH (n)-[:BELONGS_TO]->(c)
+            RETURN c.id AS community, elementId(n) AS eid
+        """, {"level": level})
+        for r in result:
+            members, _ = subgraphs.setdefault(r["community"], ([], []))
+            index[r["eid"]] = len(members)
+            members.append(r["eid"])
+
+        # Expand only from members, keeping edges whose ends share a community
+        result = session.run(LIVE_COMMUNITIES + """
+            MATCH (c)<-[:BELONGS_TO]-(a)-[r]->(b)-[:BELONGS_TO]->(c)
+            RETURN c.id AS community, elementId(a) AS source, elementId(b) AS target
+        """, {"level": level})
+        for r in result:
+            subgraphs[r["community"]][1].append((index[r["source"]], index[r["target"]]))
+
+    return subgraphs
+
+
+def compute_community_layouts(subgraphs: dict, workers: int | None = None,
+                              algorithm: str = "fa2", settings: dict | None = None) -> dict:
+    """Lay out each subgraph from fetch_community_subgraphs() in a process pool.
+
+    Returns {community id: [(x, y), ...]} in member order.
+    """
+    # Largest first so the pool is not left waiting on one big community
+    order = sorted(subgraphs, key=lambda cid: len(subgraphs[cid][0]), reverse=True)
+    # Processes already share the cores; keep FA2 single-threaded inside each
+    settings = {**(settings or {}), "threads": 1}
+    tasks = [(len(subgraphs[cid][0]), subgraphs[cid][1], algorithm, settings) for cid in order]
+    workers = workers or os.cpu_count()
+
+    print(f"Computing layout for {len(tasks)} communities with {workers} workers...")
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(order, pool.map(_layout_subgraph, tasks, chunksize=chunksize)))
+
+
+def layout_all_communities_parallel(driver, level: int = 0, workers: int | None = None,
+                                    algorithm: str = "fa2", settings: dict | None = None):
+    """Lay out every community's members concurrently in a process pool."""
+    subgraphs = fetch_community_subgraphs(driver, level)
+    if not subgraphs:
+        print("No communities to layout.")
+        return
+
+    layouts = compute_community_layouts(subgraphs, workers, algorithm, settings)
+    element_ids = []
+    coords = []
+    for cid, layout in layouts.items():
+        element_ids.extend(subgraphs[cid][0])
+        coords.extend(layout)
+
+    write_positions(driver, element_ids, coords)
+    print(f"Layout written for {len(element_ids)} nodes in {len(layouts)} communities.")
+
+
+def compose_layouts(centres: dict, sizes: dict, layouts: dict, packing: float = COMPOSE_PACKING) -> dict:
+    """Place each community's member layout around its overview position.
+
+    Every layout is centred and scaled to a radius proportional to the square
+    root of its member count, so area follows size. The common unit is taken
+    from the overview: for each community, the distance to its nearest
+    neighbour split by their root sizes, with the median (over at most
+    COMPOSE_SAMPLE communities) times `packing`. Returns {community id: (k, 2) array of global coordinates}.
+    """
+    cids = [cid for cid in layouts if cid in centres]
+    if not cids:
+        return {}
+    centre = np.array([centres[cid] for cid in cids], dtype=np.float64)
+    root = np.sqrt(np.array([max(sizes.get(cid, 1), 1) for cid in cids], dtype=np.float64))
+
+    if len(cids) > 1:
+        sample = np.arange(len(cids))
+        if len(cids) > COMPOSE_SAMPLE:
+            sample = np.sort(np.random.default_rng(0).choice(len(cids), COMPOSE_SAMPLE, replace=False))
+        # Rows per block keep the (rows, C, 2) difference array near 2M pairs
+        chunk = max(1, 2_000_000 // len(cids))
+        ratios = []
+        for start in range(0, len(sample), chunk):
+            rows = sample[start:start + chunk]
+            d = np.sqrt(((centre[rows, None] - centre[None]) ** 2).sum(axis=2))
+            d[np.arange(len(rows)), rows] = np.inf
+            nearest = d.argmin(axis=1)
+            ratios.append(d[np.arange(len(rows)), nearest] / (root[rows] + root[nearest]))
+        unit = packing * float(np.median(np.concatenate(ratios)))
+    else:
+        unit = 1.0
+
+    composed = {}
+    for i, cid in enumerate(cids):
+        local = np.asarray(layouts[cid], dtype=np.float64).reshape(-1, 2)
+        local = local - local.mean(axis=0)
+        rms = float(np.sqrt((local * local).sum(axis=1).mean()))
+        if rms > 0:
+            local *= unit * root[i] / rms
+        composed[cid] = centre[i] + local
+    return composed
+
+
+def layout_composed(driver, level: int = 0, workers: int | None = None,
+                    algorithm: str = "fa2", settings: dict | None = None):
+    """Write global member coordinates consistent with the community overview.
+
+    Communities need overview x/y from community.py's run_layout; members of
+    communities without one keep their current positions.
+    """
+    with driver.session() as session:
+        result = session.run(LIVE_COMMUNITIES + """
+            WITH c WHERE c.x IS NOT NULL
+            RETURN c.id AS id, c.x AS x, c.y AS y, c.member_count AS size
+        """, {"level": level})
+        centres = {}
+        sizes = {}
+        for r in result:
+            centres[r["id"]] = (r["x"], r["y"])
+            sizes[r["id"]] = r["size"] or 1
+
+    subgraphs = fetch_community_subgraphs(driver, level)
+    missing = len(set(subgraphs) - set(centres))
+    if missing:
+        print(f"Skipping {missing} communities without overview positions.")
+    subgraphs = {cid: sg for cid, sg in subgraphs.items() if cid in centres}
+    if not subgraphs:
+        print("No positioned communities to compose.")
+        return
+
+    layouts = compute_community_layouts(subgraphs, workers, algorithm, settings)
+    composed = compose_layouts(centres, sizes, layouts)
+
+    element_ids = []
+    coords = []
+    for cid, xy in composed.items():
+        element_ids.extend(subgraphs[cid][0])
+        coords.extend(xy)
+    write_positions(driver, element_ids, coords)
+    print(f"Composed layout written for {len(element_ids)} nodes in {len(composed)} communities.")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Graph layout computation")
     parser.add_argument("--uri", default="bolt://localhost:7687", help="Neo4j URI")
-    parser.add_argument("--target", default="all", help="Layout target: all, communities, or community_<id>")
-    parser.add_argument("--max-nodes", type=int, default=50000, help="Max nodes for full graph layout")
+    parser.add_argument("--target", default="all", help="Layout target: all, communities, composed, or community_<id>")
+    parser.add_argument("--max-nodes", type=int, default=50000,
+                        help="Above this many nodes, lay out the full graph multilevel")
+    parser.add_argument("--level", type=int, default=0, help="Community level for --target communities or composed")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Lay out communities concurrently in a process pool")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes for --parallel (default: CPU count)")
+    parser.add_argument("--algorithm", choices=["fa2", "multilevel", "fr", "drl"], default="fa2",
+                        help="Layout engine (default: fa2)")
+    parser.add_argument("--iterations", type=int, default=100, help="Max FA2 iterations")
+    parser.add_argument("--threads", type=int, default=1, help="Threads for FA2 repulsion")
+    parser.add_argument("--gravity", type=float, default=1.0, help="FA2 gravity")
+    parser.add_argument("--scaling-ratio", type=float, default=10.0, help="FA2 repulsion scaling")
+    parser.add_argument("--lin-log", action="store_true", help="FA2 LinLog attraction")
+    parser.add_argument("--theta", type=float, default=1.2, help="FA2 Barnes-Hut opening angle")
+    parser.add_argument("--tolerance", type=float, default=1e-3,
+                        help="FA2 stops once relative displacement falls below this")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for FA2 start positions")
+    parser.add_argument("--progress-every", type=int, default=0,
+                        help="Print FA2 progress every N iterations")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only place nodes without x/y, keeping existing positions")
+    parser.add_argument("--hops", type=int, default=1,
+                        help="Neighbourhood around new nodes refined in --incremental mode")
+    parser.add_argument("--damping", type=float, default=0.1,
+                        help="Relative speed of already positioned nodes in --incremental mode")
     args = parser.parse_args()
 
+    settings = {
+        "iterations": args.iterations,
+        "threads": args.threads,
+        "gravity": args.gravity,
+        "scaling_ratio": args.scaling_ratio,
+        "lin_log": args.lin_log,
+        "theta": args.theta,
+        "tolerance": args.tolerance,
+        "seed": args.seed,
+        "progress_every": args.progress_every,
+    }
+
     driver = get_driver(args.uri)
 
     try:
         start = time.time()
 
-        if args.target == "all":
-            layout_all_nodes(driver, args.max_nodes)
+        if args.incremental:
+            layout_incremental(driver, args.hops, args.damping, settings)
+        elif args.target == "all":
+            layout_all_nodes(driver, args.max_nodes, args.algorithm, settings)
+        elif args.target == "composed":
+            layout_composed(driver, args.level, args.workers, args.algorithm, settings)
+        elif args.target == "communities" and args.parallel:
+            layout_all_communities_parallel(driver, args.level, args.workers, args.algorithm, settings)
         elif args.target == "communities":
-            layout_all_communities(driver)
+            layout_all_communities(driver, args.level, args.algorithm, settings)
         elif args.target.startswith("community_"):
-            layout_community(driver, args.target)
+            layout_community(driver, args.target, args.algorithm, settings)
         else:
             print(f"Unknown target: {args.target}")
             sys.exit(1)
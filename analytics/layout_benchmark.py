@@ -0,0 +1,233 @@
+"""
+Layout quality and runtime benchmark for the engines in layout.py.
+
+Runs each algorithm on synthetic graphs (planted communities, scale-free,
+grid) at several sizes and, with --uri, on the graph exported from Neo4j.
+Each run happens in a fresh process so peak memory is per run. Records:
+
+- wall time and peak RSS above the loaded graph
+- iterations (FA2 until convergence or the cap; FR's fixed count; DrL n/a)
+- normalized stress over graph distances from sampled sources
+- crossing rate among sampled pairs of non-adjacent edges
+- neighbourhood preservation: mean Jaccard of each sampled node's graph
+  neighbours and as many nearest layout neighbours
+
+Usage:
+    python layout_benchmark.py [--sizes 1000 5000 20000] [--algorithms fa2 multilevel fr drl]
+                               [--graphs sbm ba grid] [--uri bolt://localhost:7687]
+                               [--output layout-benchmark.json]
+"""
+
+import argparse
+import json
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import igraph as ig
+import numpy as np
+
+from layout import compute_layout, get_driver
+
+# Metric sample sizes
+STRESS_SOURCES = 50
+CROSSING_PAIRS = 200000
+NEIGHBOURHOOD_NODES = 500
+
+
+def synthetic_graph(kind: str, n: int, seed: int = 0) -> ig.Graph:
+    """Planted-partition, Barabasi-Albert or square-grid graph with about `n` nodes."""
+    ig.set_random_number_generator(random.Random(seed))
+    if kind == "sbm":
+        blocks = max(2, int(np.sqrt(n) / 3))
+        sizes = [n // blocks] * blocks
+        p_in, p_out = 8.0 / sizes[0], 0.5 / n
+        pref = np.full((blocks, blocks), p_out) + np.eye(blocks) * p_in
+        return ig.Graph.SBM(pref_matrix=pref.tolist(), block_sizes=sizes)
+    if kind == "ba":
+        return ig.Graph.Barabasi(n, 2)
+    if kind == "grid":
+        side = int(np.sqrt(n))
+        return ig.Graph.Lattice([side, side], circular=False)
+    raise ValueError(f"Unknown synthetic graph: {kind}")
+
+
+def export_graph(uri: str) -> ig.Graph:
+    """The live graph (without community bookkeeping) as an undirected igraph Graph."""
+    driver = get_driver(uri)
+    try:
+        with driver.session() as session:
+            result = session.run(
+                "MATCH (n) WHERE NOT n:Community AND NOT n:CommunityGeneration "
+                "RETURN elementId(n) AS eid"
+            )
+            index = {r["eid"]: i for i, r in enumerate(result)}
+            result = session.run("MATCH (a)-[r]->(b) RETURN elementId(a) AS source, elementId(b) AS target")
+            edges = []
+            for r in result:
+                src = index.get(r["source"])
+                tgt = index.get(r["target"])
+                if src is not None and tgt is not None:
+                    edges.append((src, tgt))
+    finally:
+        driver.close()
+    return ig.Graph(n=len(index), edges=edges, directed=False)
+
+
+def normalized_stress(g: ig.Graph, pos: np.ndarray, rng) -> float:
+    """Stress against BFS distances from sampled sources, after optimal scaling."""
+    sources = rng.choice(g.vcount(), size=min(STRESS_SOURCES, g.vcount()), replace=False)
+    graph_d = np.array(g.distances(source=sources.tolist()), dtype=np.float64)
+    layout_d = np.sqrt(((pos[sources][:, None, :] - pos[None, :, :]) ** 2).sum(axis=2))
+    ok = np.isfinite(graph_d) & (graph_d > 0)
+    gd, ld = graph_d[ok], layout_d[ok]
+    if len(gd) == 0:
+        return float("nan")
+    # Scale minimizing sum((s*ld - gd)^2 / gd^2)
+    scale = (ld / gd).sum() / ((ld / gd) ** 2).sum()
+    return float((((scale * ld - gd) / gd) ** 2).mean())
+
+
+def crossing_rate(edges: np.ndarray, pos: np.ndarray, rng) -> float:
+    """Fraction of sampled edge pairs (sharing no endpoint) that cross."""
+    if len(edges) < 2:
+        return 0.0
+    i = rng.integers(0, len(edges), CROSSING_PAIRS)
+    j = rng.integers(0, len(edges), CROSSING_PAIRS)
+    a, b = edges[i], edges[j]
+    disjoint = ((a[:, :, None] != b[:, None, :]).all(axis=(1, 2)))
+    a, b = a[disjoint], b[disjoint]
+    if len(a) == 0:
+        return 0.0
+    p1, p2, q1, q2 = pos[a[:, 0]], pos[a[:, 1]], pos[b[:, 0]], pos[b[:, 1]]
+
+    def orient(p, q, r):
+        return np.sign((q[:, 0] - p[:, 0]) * (r[:, 1] - p[:, 1]) - (q[:, 1] - p[:, 1]) * (r[:, 0] - p[:, 0]))
+
+    crosses = (orient(p1, p2, q1) * orient(p1, p2, q2) < 0) & (orient(q1, q2, p1) * orient(q1, q2, p2) < 0)
+    return float(crosses.mean())
+
+
+def neighbourhood_preservation(g: ig.Graph, pos: np.ndarray, rng) -> float:
+    """Mean Jaccard of graph neighbours vs the same number of nearest layout neighbours."""
+    candidates = np.flatnonzero(np.array(g.degree()) > 0)
+    if len(candidates) == 0:
+        return float("nan")
+    sample = rng.choice(candidates, size=min(NEIGHBOURHOOD_NODES, len(candidates)), replace=False)
+    scores = []
+    for start in range(0, len(sample), 50):
+        chunk = sample[start:start + 50]
+        d = ((pos[chunk][:, None, :] - pos[None, :, :]) ** 2).sum(axis=2)
+        d[np.arange(len(chunk)), chunk] = np.inf
+        for row, v in zip(d, chunk):
+            neighbours = set(g.neighbors(int(v)))
+            k = len(neighbours)
+            nearest = set(np.argpartition(row, k - 1)[:k].tolist()) if k < len(row) else set(range(len(row)))
+            scores.append(len(neighbours & nearest) / len(neighbours | nearest))
+    return float(np.mean(scores))
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_one(task):
+    """Process pool worker: lay out one graph with one algorithm and score it."""
+    n, edges, algorithm, settings, seed = task
+    baseline = _peak_rss_mb()
+    stats = {}
+    if algorithm in ("fa2", "multilevel"):
+        settings = {**settings, "stats": stats}
+    start = time.perf_counter()
+    pos = np.asarray(compute_layout(n, edges, algorithm, settings), dtype=np.float64)
+    elapsed = time.perf_counter() - start
+    peak = _peak_rss_mb()
+
+    if algorithm == "fr":
+        stats["iterations"] = 500
+
+    rng = np.random.default_rng(seed)
+    g = ig.Graph(n=n, edges=edges, directed=False)
+    edge_array = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    return {
+        "seconds": elapsed,
+        "peak_mb": max(peak - baseline, 0.0),
+        "iterations": stats.get("iterations"),
+        "stress": normalized_stress(g, pos, rng),
+        "crossings": crossing_rate(edge_array, pos, rng),
+        "neighbourhood": neighbourhood_preservation(g, pos, rng),
+    }
+
+
+def run_benchmark(graphs: dict, algorithms: list, settings: dict, seed: int = 0) -> list:
+    """Run every algorithm on every graph, each in its own process."""
+    results = []
+    for name, g in graphs.items():
+        edges = g.get_edgelist()
+        print(f"\n{name}: {g.vcount():,} nodes, {g.ecount():,} edges")
+        for algorithm in algorithms:
+            # A fresh process per run so ru_maxrss is this run's peak
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                row = pool.submit(_run_one, (g.vcount(), edges, algorithm, settings, seed)).result()
+            row = {"graph": name, "nodes": g.vcount(), "edges": g.ecount(), "algorithm": algorithm, **row}
+            results.append(row)
+            print(f"  {algorithm:<10} {row['seconds']:8.2f}s  {row['peak_mb']:8.1f}MB  "
+                  f"stress={row['stress']:.3f}  crossings={row['crossings']:.4f}  "
+                  f"neighbourhood={row['neighbourhood']:.3f}")
+    return results
+
+
+def print_table(results: list):
+    """Comparison table, one row per graph and algorithm."""
+    header = (f"{'graph':<16} {'nodes':>9} {'algorithm':<10} {'time s':>8} {'peak MB':>8} "
+              f"{'iters':>6} {'stress':>7} {'cross':>7} {'nbhd':>6}")
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        iters = "-" if r["iterations"] is None else str(r["iterations"])
+        print(f"{r['graph']:<16} {r['nodes']:>9,} {r['algorithm']:<10} {r['seconds']:>8.2f} "
+              f"{r['peak_mb']:>8.1f} {iters:>6} {r['stress']:>7.3f} {r['crossings']:>7.4f} "
+              f"{r['neighbourhood']:>6.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Layout quality and runtime benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000],
+                        help="Synthetic graph sizes")
+    parser.add_argument("--graphs", nargs="+", choices=["sbm", "ba", "grid"], default=["sbm", "ba", "grid"],
+                        help="Synthetic graph families")
+    parser.add_argument("--algorithms", nargs="+", choices=["fa2", "multilevel", "fr", "drl"],
+                        default=["fa2", "multilevel", "fr", "drl"], help="Layout engines to compare")
+    parser.add_argument("--uri", default=None, help="Also benchmark the graph in this Neo4j database")
+    parser.add_argument("--iterations", type=int, default=100, help="Max FA2 iterations")
+    parser.add_argument("--threads", type=int, default=1, help="Threads for FA2 repulsion")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for graphs, layouts and metric samples")
+    parser.add_argument("--output", default="layout-benchmark.json", help="JSON results file")
+    args = parser.parse_args()
+
+    graphs = {}
+    for kind in args.graphs:
+        for size in args.sizes:
+            graphs[f"{kind}-{size}"] = synthetic_graph(kind, size, args.seed)
+    if args.uri:
+        graphs["neo4j"] = export_graph(args.uri)
+
+    settings = {"iterations": args.iterations, "threads": args.threads, "seed": args.seed}
+    start = time.time()
+    results = run_benchmark(graphs, args.algorithms, settings, args.seed)
+    print_table(results)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "settings": {**settings, "algorithms": args.algorithms},
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults written to {args.output} in {time.time() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Collect per-type property statistics into a catalog for planners and UI filters.
+
+Streams every node (grouped by node_type) and relationship (grouped by type)
+once and records, per property:
+
+- null fraction (share of the group without the property)
+- distinct count, estimated with HyperLogLog
+- top-k values with approximate counts (lower bounds)
+- for numeric properties in HISTOGRAM_PROPERTIES, min/max and an equi-depth
+  histogram from a reservoir sample
+
+The catalog is written as JSON next to graph-config.json, where the web API
+reads it to order structured-query predicates and warn on unselective filters.
+
+Usage:
+    python property_stats.py [--uri bolt://localhost:7687] [--output ../web/public/data/property-stats.json]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+
+from neo4j import GraphDatabase
+
+# Numeric properties that get histograms
+HISTOGRAM_PROPERTIES = ("doc_count", "amount", "section")
+HISTOGRAM_BUCKETS = 20
+RESERVOIR_SIZE = 10000
+
+# Top values reported, and the working set kept while streaming
+TOP_K = 10
+TOP_K_CAPACITY = 1000
+
+# HyperLogLog registers = 2^HLL_PRECISION (about 1.6% standard error at 12)
+HLL_PRECISION = 12
+
+# Bookkeeping written by the analytics pipeline itself
+SKIP_LABELS = ("Community", "CommunityGeneration")
+SKIP_REL_TYPES = ("BELONGS_TO", "INTER_COMMUNITY", "PARENT_OF")
+
+
+def get_driver(uri: str):
+    return GraphDatabase.driver(uri, auth=("", ""))
+
+
+class HyperLogLog:
+    """Distinct-count sketch over 64-bit hashes of the values' JSON text."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        digest = hashlib.blake2b(_key(value).encode(), digest_size=8).digest()
+        h = int.from_bytes(digest, "big")
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # Small-range correction: linear counting
+            estimate = self.m * math.log(self.m / zeros)
+        return round(estimate)
+
+
+class TopK:
+    """Frequent values: counts everything, pruning to the heaviest when the set grows.
+
+    Counts of values that were pruned and came back are lower bounds.
+    """
+
+    def __init__(self, capacity: int = TOP_K_CAPACITY):
+        self.capacity = capacity
+        self.counts = Counter()
+
+    def add(self, value):
+        self.counts[_key(value)] += 1
+        if len(self.counts) > 10 * self.capacity:
+            self.counts = Counter(dict(self.counts.most_common(self.capacity)))
+
+    def top(self, k: int = TOP_K) -> list:
+        return [{"value": json.loads(v), "count": c} for v, c in self.counts.most_common(k)]
+
+
+class PropertyStats:
+    """Streaming statistics for one property within one group."""
+
+    def __init__(self, histogram: bool):
+        self.non_null = 0
+        self.hll = HyperLogLog()
+        self.top = TopK()
+        self.histogram = histogram
+        self.numeric = 0
+        self.min = None
+        self.max = None
+        self.reservoir = []
+
+    def add(self, value, rng: random.Random):
+        self.non_null += 1
+        self.hll.add(value)
+        self.top.add(value)
+        if self.histogram and isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.numeric += 1
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+            if len(self.reservoir) < RESERVOIR_SIZE:
+                self.reservoir.append(value)
+            else:
+                j = rng.randrange(self.numeric)
+                if j < RESERVOIR_SIZE:
+                    self.reservoir[j] = value
+
+    def summary(self, total: int) -> dict:
+        out = {
+            "null_fraction": round(1 - self.non_null / total, 6) if total else 0.0,
+            "distinct": min(self.hll.count(), self.non_null),
+            "top": self.top.top(),
+        }
+        if self.histogram and self.numeric:
+            out["min"] = self.min
+            out["max"] = self.max
+            out["histogram"] = equi_depth_histogram(self.reservoir, self.numeric)
+        return out
+
+
+def _key(value) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def equi_depth_histogram(sample: list, population: int, buckets: int = HISTOGRAM_BUCKETS) -> list:
+    """Bucket bounds holding about equal shares of the values, with estimated counts."""
+    values = sorted(sample)
+    n = len(values)
+    bounds = sorted({values[min(n - 1, round(i * (n - 1) / buckets))] for i in range(buckets + 1)})
+    hist = []
+    for lo, hi in zip(bounds, bounds[1:] or bounds):
+        last = hi == bounds[-1]
+        inside = sum(1 for v in values if lo <= v < hi or (last and v == hi))
+        hist.append({"lo": lo, "hi": hi, "count": round(inside / n * population)})
+    return hist
+
+
+def collect_stats(records, key_fn, rng: random.Random) -> dict:
+    """Aggregate (group, properties) records into {group: {"count", "properties"}}."""
+    groups = {}
+    for r in records:
+        group = key_fn(r)
+        entry = groups.setdefault(group, {"count": 0, "properties": {}})
+        entry["count"] += 1
+        for prop, value in (r["props"] or {}).items():
+            if value is None:
+                continue
+            stats = entry["properties"].get(prop)
+            if stats is None:
+                stats = entry["properties"][prop] = PropertyStats(prop in HISTOGRAM_PROPERTIES)
+            stats.add(value, rng)
+
+    return {
+        group: {
+            "count": entry["count"],
+            "properties": {
+                prop: stats.summary(entry["count"])
+                for prop, stats in sorted(entry["properties"].items())
+            },
+        }
+        for group, entry in groups.items()
+    }
+
+
+def build_catalog(driver, seed: int | None = None) -> dict:
+    """One streamed pass over nodes and one over relationships."""
+    rng = random.Random(seed)
+    timings = {}
+    with driver.session() as session:
+        start = time.perf_counter()
+        result = session.run("""
+            MATCH (n)
+            WHERE NOT any(l IN labels(n) WHERE l IN $skip)
+            RETURN n.node_type AS node_type, labels(n) AS labels, properties(n) AS props
+        """, {"skip": list(SKIP_LABELS)})
+        node_types = collect_stats(
+            result, lambda r: r["node_type"] or (r["labels"][0] if r["labels"] else "Unknown"), rng)
+        timings["nodes"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        result = session.run("""
+            MATCH ()-[r]->()
+            WHERE NOT type(r) IN $skip
+            RETURN type(r) AS rel_type, properties(r) AS props
+        """, {"skip": list(SKIP_REL_TYPES)})
+        edge_types = collect_stats(result, lambda r: r["rel_type"], rng)
+        timings["relationships"] = (time.perf_counter() - start) * 1000
+
+    return {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "nodeTypes": node_types,
+        "edgeTypes": edge_types,
+        "timings": timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-type property statistics catalog")
+    parser.add_argument("--uri", default="bolt://localhost:7687", help="Neo4j URI")
+    parser.add_argument("--output", default="../web/public/data/property-stats.json", help="Output path")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for histogram reservoirs")
+    args = parser.parse_args()
+
+    driver = get_driver(args.uri)
+
+    try:
+        print("Collecting property statistics...")
+        catalog = build_catalog(driver, args.seed)
+
+        for section in ("nodeTypes", "edgeTypes"):
+            for group, entry in catalog[section].items():
+                print(f"  {group}: {entry['count']} items, {len(entry['properties'])} properties")
+        for name, ms in catalog["timings"].items():
+            print(f"  {name}: {ms:.1f}ms")
+
+        with open(args.output + ".tmp", "w") as f:
+            json.dump(catalog, f, indent=2)
+        os.replace(args.output + ".tmp", args.output)
+
+        print(f"\nCatalog written to {args.output}")
+
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Build a spatial tile pyramid over precomputed node positions.
+
+Zoom level z splits the layout's square bounding box into 2^z x 2^z tiles.
+Every tile keeps its most important nodes (by degree and doc_count) up to
+--tile-capacity, so a node that appears at one zoom appears at every deeper
+one; the deepest level keeps everything. Edges are stored with both
+endpoints' tiles once both ends are visible.
+
+Tiles are written as ready-to-serve JSON (plus a .gz copy) under
+<dir>/<generation>/<z>/<x>/<y>.json, with x and y counted from the box's
+minimum corner, and <dir>/current.json is swapped to the new generation last
+so /api/graph/viewport never reads a half-built pyramid.
+
+Usage:
+    python tiles.py [--uri bolt://localhost:7687] [--out-dir ../web/public/data/tiles]
+                    [--tile-capacity 500] [--max-zoom 12] [--keep 1]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from neo4j import GraphDatabase
+
+from artifacts import publish, write_json
+
+# Nodes per tile before lower-ranked ones are deferred to deeper zooms
+TILE_CAPACITY = 500
+
+# Hard cap on pyramid depth
+MAX_ZOOM = 12
+
+
+def get_driver(uri: str):
+    return GraphDatabase.driver(uri, auth=("", ""))
+
+
+def fetch_positioned_graph(driver):
+    """Positioned nodes and the edges between them.
+
+    Returns (node data dicts, x/y array, degree, doc_count, edge index pairs,
+    edge data dicts).
+    """
+    ids = []
+    data = []
+    xy = []
+    degree = []
+    doc_count = []
+    with driver.session() as session:
+        result = session.run("""
+            MATCH (n)
+            WHERE n.x IS NOT NULL AND n.y IS NOT NULL
+              AND NOT n:Community AND NOT n:CommunityGeneration
+            RETURN n.id AS id, coalesce(n.label, n.name, n.id) AS label,
+                   n.node_type AS node_type, coalesce(n.doc_count, 0) AS doc_count,
+                   n.x AS x, n.y AS y,
+                   COUNT { (n)--(m) WHERE NOT m:Community } AS degree
+        """)
+        for r in result:
+            ids.append(r["id"])
+            data.append({
+                "id": str(r["id"]),
+                "label": str(r["label"]),
+                "node_type": r["node_type"] or "Unknown",
+                "doc_count": r["doc_count"],
+                "degree": r["degree"],
+                "x": r["x"],
+                "y": r["y"],
+            })
+            xy.append((r["x"], r["y"]))
+            degree.append(r["degree"])
+            doc_count.append(r["doc_count"])
+
+        index = {nid: i for i, nid in enumerate(ids)}
+        edges = []
+        edge_data = []
+        result = session.run("""
+            MATCH (a)-[r]->(b)
+            WHERE a.x IS NOT NULL AND b.x IS NOT NULL
+              AND NOT a:Community AND NOT b:Community
+            RETURN a.id AS source, b.id AS target, type(r) AS rel_type, r.id AS rid
+        """)
+        for r in result:
+            src = index.get(r["source"])
+            tgt = index.get(r["target"])
+            if src is None or tgt is None:
+                continue
+            edges.append((src, tgt))
+            source, target = str(r["source"]), str(r["target"])
+            edge_data.append({
+                "id": str(r["rid"] or f"{source}-{r['rel_type']}-{target}"),
+                "source": source,
+                "target": target,
+                "edge_type": r["rel_type"],
+            })
+
+    return (
+        data,
+        np.array(xy, dtype=np.float64).reshape(-1, 2),
+        np.array(degree, dtype=np.float64),
+        np.array(doc_count, dtype=np.float64),
+        np.array(edges, dtype=np.int64).reshape(-1, 2),
+        edge_data,
+    )
+
+
+def importance(degree: np.ndarray, doc_count: np.ndarray) -> np.ndarray:
+    """Rank score per node; logs keep a few huge hubs from drowning out doc_count."""
+    return np.log1p(degree) + np.log1p(doc_count)
+
+
+def assign_min_zoom(xy: np.ndarray, score: np.ndarray, origin: np.ndarray, size: float,
+                    capacity: int = TILE_CAPACITY, max_zoom: int = MAX_ZOOM):
+    """First zoom at which each node ranks within its tile's top `capacity`.
+
+    Returns (min zoom per node, deepest zoom needed). A tile's top nodes stay
+    on top in whichever child tile holds them, so visibility only grows with
+    zoom.
+    """
+    n = len(xy)
+    unit = (xy - origin) / size
+    min_zoom = np.full(n, max_zoom, dtype=np.int64)
+    assigned = np.zeros(n, dtype=bool)
+
+    for z in range(max_zoom + 1):
+        k = 1 << z
+        cell = np.minimum((unit * k).astype(np.int64), k - 1)
+        key = cell[:, 0] * k + cell[:, 1]
+        order = np.lexsort((-score, key))
+        sorted_key = key[order]
+        starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+        rank = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+        visible = np.zeros(n, dtype=bool)
+        visible[order] = rank < capacity
+
+        min_zoom[visible & ~assigned] = z
+        assigned |= visible
+        if assigned.all():
+            return min_zoom, z
+    return min_zoom, max_zoom
+
+
+def _group(sorted_keys: np.ndarray, values: np.ndarray) -> dict:
+    """{key: values} for values already sorted by key."""
+    if len(sorted_keys) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    return dict(zip(sorted_keys[starts].tolist(), np.split(values, starts[1:])))
+
+
+def build_tiles(node_data: list, xy: np.ndarray, score: np.ndarray, edges: np.ndarray,
+                edge_data: list, out_dir: str, generation: str,
+                capacity: int = TILE_CAPACITY, max_zoom: int = MAX_ZOOM) -> dict:
+    """Write every non-empty tile of the pyramid; returns the manifest."""
+    origin = xy.min(axis=0)
+    size = float((xy.max(axis=0) - origin).max()) * 1.0001 or 1.0
+    min_zoom, depth = assign_min_zoom(xy, score, origin, size, capacity, max_zoom)
+    unit = (xy - origin) / size
+
+    gen_dir = os.path.join(out_dir, generation)
+    tile_count = 0
+    edge_zoom = np.maximum(min_zoom[edges[:, 0]], min_zoom[edges[:, 1]]) if len(edges) else min_zoom[:0]
+
+    for z in range(depth + 1):
+        k = 1 << z
+        cell = np.minimum((unit * k).astype(np.int64), k - 1)
+        key = cell[:, 0] * k + cell[:, 1]
+
+        nodes = np.flatnonzero(min_zoom <= z)
+        nodes = nodes[np.lexsort((-score[nodes], key[nodes]))]
+        node_groups = _group(key[nodes], nodes)
+
+        # An edge lives in the tiles of both its endpoints
+        edge_idx = np.flatnonzero(edge_zoom <= z)
+        ka, kb = key[edges[edge_idx, 0]], key[edges[edge_idx, 1]]
+        edge_keys = np.concatenate((ka, kb[kb != ka]))
+        edge_rows = np.concatenate((edge_idx, edge_idx[kb != ka]))
+        order = np.argsort(edge_keys, kind="stable")
+        edge_groups = _group(edge_keys[order], edge_rows[order])
+
+        for tile, members in node_groups.items():
+            tx, ty = divmod(tile, k)
+            tile_dir = os.path.join(gen_dir, str(z), str(tx))
+            os.makedirs(tile_dir, exist_ok=True)
+            elements = [{"group": "nodes", "data": node_data[i]} for i in members.tolist()]
+            elements.extend({"group": "edges", "data": edge_data[e]}
+                            for e in edge_groups.get(tile, np.empty(0, dtype=np.int64)).tolist())
+            write_json(os.path.join(tile_dir, f"{ty}.json"), {
+                "z": z, "x": tx, "y": ty, "elements": elements,
+            })
+            tile_count += 1
+        print(f"  Zoom {z}: {len(node_groups)} tiles, {len(nodes)} nodes, {len(edge_idx)} edges")
+
+    print(f"Wrote {tile_count} tiles over {depth + 1} zoom levels to {gen_dir}.")
+    return {
+        "generation": generation,
+        "origin": [float(origin[0]), float(origin[1])],
+        "size": size,
+        "max_zoom": depth,
+        "tile_capacity": capacity,
+        "path": f"{generation}/{{z}}/{{x}}/{{y}}.json",
+    }
+
+
+def publish_tiles(out_dir: str, manifest: dict, keep: int = 1):
+    """Point current.json at the manifest's generation and prune older ones."""
+    publish(out_dir, manifest, manifest["generation"], keep)
+    print(f"Published tiles for generation {manifest['generation']}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spatial tile pyramid over layout positions")
+    parser.add_argument("--uri", default="bolt://localhost:7687", help="Neo4j URI")
+    parser.add_argument("--out-dir", default=os.path.join("..", "web", "public", "data", "tiles"),
+                        help="Directory served as public/data/tiles by the web app")
+    parser.add_argument("--tile-capacity", type=int, default=TILE_CAPACITY,
+                        help="Max nodes per tile above the deepest zoom")
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM, help="Deepest zoom level")
+    parser.add_argument("--keep", type=int, default=1,
+                        help="Previous tile generations to keep for in-flight readers")
+    args = parser.parse_args()
+
+    driver = get_driver(args.uri)
+
+    try:
+        start = time.time()
+        node_data, xy, degree, doc_count, edges, edge_data = fetch_positioned_graph(driver)
+        if not node_data:
+            print("No positioned nodes; run layout.py first.")
+            return
+        print(f"Tiling {len(node_data)} nodes, {len(edges)} edges...")
+
+        os.makedirs(args.out_dir, exist_ok=True)
+        generation = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        manifest = build_tiles(node_data, xy, importance(degree, doc_count), edges, edge_data,
+                               args.out_dir, generation, args.tile_capacity, args.max_zoom)
+        publish_tiles(args.out_dir, manifest, args.keep)
+
+        elapsed = time.time() - start
+        print(f"Tiles complete in {elapsed:.1f}s.")
+
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
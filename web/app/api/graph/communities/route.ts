@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from "next/server";
 import { isNeo4jAvailable } from "@/lib/neo4j";
 import { getCommunities } from "@/lib/graph-queries";
+import { getCommunityArtifact } from "@/lib/community-artifacts";
 
 export async function GET(request: NextRequest) {
   const { searchParams } = new URL(request.url);
@@ -8,6 +9,23 @@ export async function GET(request: NextRequest) {
   const limit = Math.min(parseInt(searchParams.get("limit") || "200"), 500);
 
   try {
+    // Precomputed overview from the community pipeline, when published
+    const artifact = await getCommunityArtifact(level, limit);
+    if (artifact) {
+      return NextResponse.json(
+        {
+          elements: artifact.elements,
+          count: {
+            nodes: artifact.elements.filter((e) => e.group === "nodes").length,
+            edges: artifact.elements.filter((e) => e.group === "edges").length,
+          },
+          source: "artifact",
+          generation: artifact.generation,
+        },
+        { headers: { "Cache-Control": "public, s-maxage=300, stale-while-revalidate=600" } }
+      );
+    }
+
     if (!isNeo4jAvailable()) {
       return NextResponse.json(
         { elements: [], source: "static", message: "Neo4j not available. Communities require a live database." }
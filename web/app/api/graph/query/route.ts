@@ -3,6 +3,7 @@ import { isNeo4jAvailable } from "@/lib/neo4j";
 import { executeViewQuery } from "@/lib/graph-queries";
 import { requireRole } from "@/lib/auth-guard";
 import type { ViewQuery } from "@/lib/graph-data";
+import { filterWarnings } from "@/lib/property-stats";
 
 export async function POST(request: NextRequest) {
   const { error: authError } = await requireRole("mod");
@@ -29,6 +30,7 @@ export async function POST(request: NextRequest) {
 
     const limit = Math.min(body.limit || 5000, 10000);
     const elements = await executeViewQuery(query, limit);
+    const warnings = query.type === "structured" ? filterWarnings(query.filters, query.nodeTypes) : [];
 
     return NextResponse.json({
       elements,
@@ -36,6 +38,7 @@ export async function POST(request: NextRequest) {
         nodes: elements.filter((e) => e.group === "nodes").length,
         edges: elements.filter((e) => e.group === "edges").length,
       },
+      ...(warnings.length > 0 && { warnings }),
     });
   } catch (error) {
     return NextResponse.json(
@@ -0,0 +1,49 @@
+import { NextRequest, NextResponse } from "next/server";
+import { getViewport } from "@/lib/tile-artifacts";
+
+export async function GET(request: NextRequest) {
+  const { searchParams } = new URL(request.url);
+  const bounds = ["minX", "minY", "maxX", "maxY"].map((k) => parseFloat(searchParams.get(k) ?? ""));
+  const zoomParam = searchParams.get("zoom");
+  const zoom = zoomParam !== null ? parseInt(zoomParam) : undefined;
+
+  if (bounds.some((v) => Number.isNaN(v)) || bounds[0] > bounds[2] || bounds[1] > bounds[3]) {
+    return NextResponse.json(
+      { error: "Query parameters minX, minY, maxX and maxY are required" },
+      { status: 400 }
+    );
+  }
+  if (zoom !== undefined && Number.isNaN(zoom)) {
+    return NextResponse.json({ error: "Invalid zoom" }, { status: 400 });
+  }
+
+  try {
+    const [minX, minY, maxX, maxY] = bounds;
+    const result = getViewport({ minX, minY, maxX, maxY }, zoom);
+    if (!result) {
+      return NextResponse.json(
+        { elements: [], source: "static", message: "No tile pyramid published. Run analytics/tiles.py." }
+      );
+    }
+
+    return NextResponse.json(
+      {
+        elements: result.elements,
+        count: {
+          nodes: result.elements.filter((e) => e.group === "nodes").length,
+          edges: result.elements.filter((e) => e.group === "edges").length,
+        },
+        zoom: result.zoom,
+        tiles: result.tiles,
+        source: "artifact",
+        generation: result.generation,
+      },
+      { headers: { "Cache-Control": "public, s-maxage=300, stale-while-revalidate=600" } }
+    );
+  } catch (error) {
+    return NextResponse.json(
+      { error: "Failed to get viewport", detail: String(error) },
+      { status: 500 }
+    );
+  }
+}
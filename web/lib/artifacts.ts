@@ -0,0 +1,16 @@
+// Static artifacts published by the analytics pipelines under public/data/<kind>/,
+// each with a current.json manifest naming the live build
+
+import { readFileSync, existsSync } from "fs";
+import { join } from "path";
+
+/** The parsed current.json in `dir`, or null if none is published or it is unreadable. */
+export function readManifest<T>(dir: string): T | null {
+  const manifestPath = join(dir, "current.json");
+  if (!existsSync(manifestPath)) return null;
+  try {
+    return JSON.parse(readFileSync(manifestPath, "utf-8")) as T;
+  } catch {
+    return null;
+  }
+}
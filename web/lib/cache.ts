@@ -73,5 +73,10 @@ export class LRUCache<T> {
 import type { CytoscapeElement } from "./graph-data";
 
 export const communityCache = new LRUCache<CytoscapeElement[]>(50, 5 * 60 * 1000);
+export const tileCache = new LRUCache<CytoscapeElement[]>(500, 10 * 60 * 1000);
 export const searchCache = new LRUCache<CytoscapeElement[]>(100, 2 * 60 * 1000);
 export const statsCache = new LRUCache<Record<string, unknown>>(1, 60 * 1000);
+export const generationCache = new LRUCache<{ generation: string | null; revision: string | null }>(
+  1,
+  30 * 1000
+);
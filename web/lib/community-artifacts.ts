@@ -0,0 +1,91 @@
+// Static community overview artifacts written by analytics/community.py --artifacts-dir
+// Layout: public/data/communities/current.json -> <revision>/level-<n>.json
+
+import { readFileSync } from "fs";
+import { join } from "path";
+import { readManifest } from "./artifacts";
+import { communityCache, generationCache } from "./cache";
+import { isNeo4jAvailable, runQuery } from "./neo4j";
+import type { CytoscapeElement, EdgeData } from "./graph-data";
+import { Record as Neo4jRecord } from "neo4j-driver";
+
+const ARTIFACT_DIR = join(process.cwd(), "public", "data", "communities");
+
+interface ArtifactManifest {
+  generation: string;
+  revision?: string;
+  levels: number;
+  files: Record<string, string>;
+}
+
+export interface CommunityArtifact {
+  generation: string;
+  elements: CytoscapeElement[];
+}
+
+/**
+ * Whether the artifact was exported from the generation and revision the
+ * Neo4j pointer names. Without a database to ask, the artifact is all there is.
+ */
+async function isCurrent(manifest: ArtifactManifest): Promise<boolean> {
+  if (!isNeo4jAvailable()) return true;
+
+  let pointer = generationCache.get("current");
+  if (!pointer) {
+    try {
+      const records = await runQuery(
+        `OPTIONAL MATCH (p:CommunityGeneration {id: 'current'})
+         RETURN p.generation AS generation, p.revision AS revision`
+      );
+      const r = records[0] as unknown as Neo4jRecord | undefined;
+      pointer = {
+        generation: r?.get("generation") ?? null,
+        revision: r?.get("revision") ?? null,
+      };
+    } catch {
+      // Unreachable database: the artifact still beats an error
+      return true;
+    }
+    generationCache.set("current", pointer);
+  }
+
+  return (
+    pointer.generation === manifest.generation &&
+    (pointer.revision ?? pointer.generation) === (manifest.revision ?? manifest.generation)
+  );
+}
+
+/**
+ * Community overview for a level from the current artifact, or null if none
+ * exists or it no longer matches the live community generation.
+ */
+export async function getCommunityArtifact(level = 0, limit = 200): Promise<CommunityArtifact | null> {
+  const manifest = readManifest<ArtifactManifest>(ARTIFACT_DIR);
+  const file = manifest?.files[String(level)];
+  if (!manifest || !file) return null;
+  if (!(await isCurrent(manifest))) return null;
+
+  // Revision is part of the key, so a cutover or update never serves stale data
+  const key = `${manifest.revision ?? manifest.generation}:${level}`;
+  let elements = communityCache.get(key);
+  if (!elements) {
+    try {
+      const data = JSON.parse(readFileSync(join(ARTIFACT_DIR, file), "utf-8"));
+      elements = data.elements as CytoscapeElement[];
+    } catch {
+      return null;
+    }
+    communityCache.set(key, elements);
+  }
+
+  // Nodes are stored by member_count DESC, matching the Neo4j query
+  const nodes = elements.filter((e) => e.group === "nodes").slice(0, limit);
+  const ids = new Set(nodes.map((e) => e.data.id));
+  const edges = elements.filter((e) => {
+    if (e.group !== "edges") return false;
+    const data = e.data as EdgeData;
+    return ids.has(data.source) && ids.has(data.target);
+  });
+
+  return { generation: manifest.generation, elements: [...nodes, ...edges] };
+}
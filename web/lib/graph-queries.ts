@@ -4,6 +4,7 @@
 import { runQuery, writeQuery, isNeo4jAvailable } from "./neo4j";
 import type { CytoscapeElement, NodeData, EdgeData, SavedView, ViewQuery } from "./graph-data";
 import { Record as Neo4jRecord } from "neo4j-driver";
+import { orderFilters } from "./property-stats";
 
 // ── Helpers ──
 
@@ -17,6 +18,14 @@ function toNumber(val: unknown): number {
 
 const META_LABELS = new Set(["efta", "available", "missing"]);
 
+// Binds `c` to the communities at $level of the generation the pointer names;
+// without a pointer, only legacy communities without a generation.
+// Mirrored by LIVE_COMMUNITIES in analytics/cypher.py.
+const LIVE_COMMUNITIES = `OPTIONAL MATCH (g:CommunityGeneration {id: 'current'})
+     WITH g
+     MATCH (c:Community {level: $level})
+     WHERE (g IS NULL AND c.generation IS NULL) OR c.generation = g.generation`;
+
 function nodeToData(node: Record<string, unknown>, labels?: string[]): NodeData {
   const props = node as Record<string, unknown>;
   let nodeType = String(props.node_type || "");
@@ -221,7 +230,8 @@ export async function executeViewQuery(
         params.nodeTypes = query.nodeTypes;
       }
       if (query.filters) {
-        for (const [key, value] of Object.entries(query.filters)) {
+        // Most selective first, per the property statistics catalog
+        for (const [key, value] of orderFilters(query.filters, query.nodeTypes)) {
           const paramKey = `filter_${key}`;
           conditions.push(`n.${key} = $${paramKey}`);
           params[paramKey] = value;
@@ -336,7 +346,7 @@ export async function getAllNodes(
     // Fallback: query all labels except meta/internal ones
     const labelRecords = await runQuery("CALL db.labels() YIELD label RETURN label");
     const skipLabels = new Set([
-      "efta", "available", "missing", "View", "Community",
+      "efta", "available", "missing", "View", "Community", "CommunityGeneration",
       // entity_ref secondary labels (covered by entity_ref query)
       "person", "company", "nickname", "email", "phone",
       "address", "place", "vehicle", "property", "tail_number",
@@ -390,7 +400,7 @@ export async function getCommunities(
   if (!isNeo4jAvailable()) return [];
 
   const nodeRecords = await runQuery(
-    `MATCH (c:Community {level: $level})
+    `${LIVE_COMMUNITIES}
      RETURN c
      ORDER BY c.member_count DESC
      LIMIT $limit`,
@@ -487,14 +497,14 @@ export async function getCommunityMembers(
     elements.push({ group: "nodes", data });
   }
 
-  // Get edges between members
+  // Get edges between members, expanding only from the community's members
   if (nodeIds.length > 0) {
     const edgeRecords = await runQuery(
-      `MATCH (a)-[r]->(b)
-       WHERE a.id IN $ids AND b.id IN $ids AND type(r) <> 'BELONGS_TO'
+      `MATCH (c:Community {id: $communityId})<-[:BELONGS_TO]-(a)-[r]->(b)-[:BELONGS_TO]->(c)
+       WHERE a.id IN $ids AND b.id IN $ids
        RETURN a.id AS source, b.id AS target, type(r) AS relType, properties(r) AS props
        LIMIT $edgeLimit`,
-      { ids: nodeIds, edgeLimit: limit * 3 }
+      { communityId, ids: nodeIds, edgeLimit: limit * 3 }
     );
 
     for (const rec of edgeRecords) {
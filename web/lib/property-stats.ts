@@ -0,0 +1,126 @@
+// Property statistics catalog written by analytics/property_stats.py
+// Layout: public/data/property-stats.json
+
+import { readFileSync, existsSync, statSync } from "fs";
+import { join } from "path";
+
+const CATALOG_PATH = join(process.cwd(), "public", "data", "property-stats.json");
+
+// Equality filters expected to match more than this share of the scanned nodes get a warning
+const UNSELECTIVE_FRACTION = 0.2;
+
+interface PropertySummary {
+  null_fraction: number;
+  distinct: number;
+  top: Array<{ value: unknown; count: number }>;
+  min?: number;
+  max?: number;
+  histogram?: Array<{ lo: number; hi: number; count: number }>;
+}
+
+interface GroupStats {
+  count: number;
+  properties: Record<string, PropertySummary>;
+}
+
+export interface PropertyCatalog {
+  generated: string;
+  nodeTypes: Record<string, GroupStats>;
+  edgeTypes: Record<string, GroupStats>;
+}
+
+let cached: { mtimeMs: number; catalog: PropertyCatalog } | null = null;
+
+/** The current catalog, re-read only when the file changes; null if none was generated. */
+export function getPropertyCatalog(): PropertyCatalog | null {
+  if (!existsSync(CATALOG_PATH)) return null;
+  try {
+    const { mtimeMs } = statSync(CATALOG_PATH);
+    if (!cached || cached.mtimeMs !== mtimeMs) {
+      cached = { mtimeMs, catalog: JSON.parse(readFileSync(CATALOG_PATH, "utf-8")) };
+    }
+    return cached.catalog;
+  } catch {
+    return null;
+  }
+}
+
+function groupsFor(catalog: PropertyCatalog, nodeTypes?: string[]): GroupStats[] {
+  if (nodeTypes && nodeTypes.length > 0) {
+    return nodeTypes.map((t) => catalog.nodeTypes[t]).filter(Boolean);
+  }
+  return Object.values(catalog.nodeTypes);
+}
+
+/**
+ * Estimated share of nodes (of the given types, or all) with `n[key] = value`.
+ * Top values use their counted frequency; anything else assumes the remaining
+ * non-null values are spread evenly over the remaining distinct values.
+ */
+export function estimateSelectivity(
+  key: string,
+  value: unknown,
+  nodeTypes?: string[]
+): number | null {
+  const catalog = getPropertyCatalog();
+  if (!catalog) return null;
+
+  const groups = groupsFor(catalog, nodeTypes);
+  const total = groups.reduce((sum, g) => sum + g.count, 0);
+  if (total === 0) return null;
+
+  const target = JSON.stringify(value);
+  let matches = 0;
+  for (const group of groups) {
+    const prop = group.properties[key];
+    if (!prop) continue;
+    const hit = prop.top.find((t) => JSON.stringify(t.value) === target);
+    if (hit) {
+      matches += hit.count;
+      continue;
+    }
+    const nonNull = group.count * (1 - prop.null_fraction);
+    const topCount = prop.top.reduce((sum, t) => sum + t.count, 0);
+    const rest = Math.max(prop.distinct - prop.top.length, 1);
+    matches += Math.max(nonNull - topCount, 0) / rest;
+  }
+  return matches / total;
+}
+
+/** Filter entries ordered most selective first; entries without estimates go last. */
+export function orderFilters(
+  filters: Record<string, unknown>,
+  nodeTypes?: string[]
+): Array<[string, unknown]> {
+  const scored = Object.entries(filters).map(
+    ([key, value]) => [key, value, estimateSelectivity(key, value, nodeTypes)] as const
+  );
+  scored.sort((a, b) => (a[2] ?? Infinity) - (b[2] ?? Infinity));
+  return scored.map(([key, value]) => [key, value]);
+}
+
+/** Human-readable warnings for filters that will not narrow the scan much. */
+export function filterWarnings(
+  filters: Record<string, unknown> | undefined,
+  nodeTypes?: string[]
+): string[] {
+  const catalog = getPropertyCatalog();
+  if (!catalog || !filters) return [];
+
+  const groups = groupsFor(catalog, nodeTypes);
+  const warnings: string[] = [];
+  for (const [key, value] of Object.entries(filters)) {
+    if (!groups.some((g) => key in g.properties)) {
+      warnings.push(`Property '${key}' does not occur on the selected node types; the filter matches nothing.`);
+      continue;
+    }
+    const selectivity = estimateSelectivity(key, value, nodeTypes);
+    if (selectivity !== null && selectivity > UNSELECTIVE_FRACTION) {
+      warnings.push(
+        `Filter ${key} = ${JSON.stringify(value)} matches about ${Math.round(selectivity * 100)}% of nodes; ` +
+          "add a more selective filter or a node type."
+      );
+    }
+  }
+  return warnings;
+}
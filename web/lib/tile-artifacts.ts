@@ -0,0 +1,109 @@
+// Spatial tile pyramid written by analytics/tiles.py
+// Layout: public/data/tiles/current.json -> <generation>/<z>/<x>/<y>.json
+
+import { readFileSync, existsSync } from "fs";
+import { join } from "path";
+import { readManifest } from "./artifacts";
+import { tileCache } from "./cache";
+import type { CytoscapeElement, EdgeData } from "./graph-data";
+
+const TILE_DIR = join(process.cwd(), "public", "data", "tiles");
+
+// Refuse viewports that would touch more tiles than this
+const MAX_TILES = 64;
+
+interface TileManifest {
+  generation: string;
+  origin: [number, number];
+  size: number;
+  max_zoom: number;
+  tile_capacity: number;
+  path: string;
+}
+
+export interface Viewport {
+  minX: number;
+  minY: number;
+  maxX: number;
+  maxY: number;
+}
+
+export interface ViewportResult {
+  generation: string;
+  zoom: number;
+  tiles: number;
+  elements: CytoscapeElement[];
+}
+
+function readTile(manifest: TileManifest, z: number, x: number, y: number): CytoscapeElement[] {
+  // Generation is part of the key, so a new pyramid never serves stale tiles
+  const key = `${manifest.generation}:${z}:${x}:${y}`;
+  let elements = tileCache.get(key);
+  if (!elements) {
+    const file = join(
+      TILE_DIR,
+      manifest.path.replace("{z}", String(z)).replace("{x}", String(x)).replace("{y}", String(y))
+    );
+    // Empty tiles are not written
+    if (!existsSync(file)) return [];
+    try {
+      elements = JSON.parse(readFileSync(file, "utf-8")).elements as CytoscapeElement[];
+    } catch {
+      return [];
+    }
+    tileCache.set(key, elements);
+  }
+  return elements;
+}
+
+/**
+ * Nodes and edges visible in a viewport (layout coordinates) at a zoom level.
+ * Without a zoom, picks the level at which the viewport spans about two tiles.
+ * Returns null when no pyramid has been published.
+ */
+export function getViewport(viewport: Viewport, zoom?: number): ViewportResult | null {
+  const manifest = readManifest<TileManifest>(TILE_DIR);
+  if (!manifest) return null;
+
+  const [ox, oy] = manifest.origin;
+  const span = Math.max(viewport.maxX - viewport.minX, viewport.maxY - viewport.minY, 1e-9);
+  let z = zoom ?? Math.ceil(Math.log2(manifest.size / span)) + 1;
+  z = Math.max(0, Math.min(manifest.max_zoom, z));
+
+  // Tiles the viewport overlaps, shrinking the zoom until the count is bounded
+  let x0 = 0, x1 = 0, y0 = 0, y1 = 0;
+  for (;;) {
+    const k = 2 ** z;
+    const tile = manifest.size / k;
+    const clamp = (v: number) => Math.max(0, Math.min(k - 1, Math.floor(v)));
+    x0 = clamp((viewport.minX - ox) / tile);
+    x1 = clamp((viewport.maxX - ox) / tile);
+    y0 = clamp((viewport.minY - oy) / tile);
+    y1 = clamp((viewport.maxY - oy) / tile);
+    if ((x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_TILES || z === 0) break;
+    z -= 1;
+  }
+
+  const nodes = new Map<string, CytoscapeElement>();
+  const edges = new Map<string, CytoscapeElement>();
+  for (let x = x0; x <= x1; x++) {
+    for (let y = y0; y <= y1; y++) {
+      for (const el of readTile(manifest, z, x, y)) {
+        (el.group === "nodes" ? nodes : edges).set(el.data.id, el);
+      }
+    }
+  }
+
+  // Edges leaving the loaded tiles would point at nodes the client lacks
+  const visibleEdges = [...edges.values()].filter((e) => {
+    const data = e.data as EdgeData;
+    return nodes.has(data.source) && nodes.has(data.target);
+  });
+
+  return {
+    generation: manifest.generation,
+    zoom: z,
+    tiles: (x1 - x0 + 1) * (y1 - y0 + 1),
+    elements: [...nodes.values(), ...visibleEdges],
+  };
+}